@@ -2,12 +2,12 @@ import sys
 import os
 import json
 import threading
+import queue
 import time
 import numpy as np
 import re
 import subprocess
 import serial
-import copy  # Added to perform deep copies of STL mesh
 
 from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtWidgets import (
@@ -34,13 +34,45 @@ from stl import mesh
 import pyvista as pv
 from pyvistaqt import QtInteractor
 
+from surface_core import (
+    smooth_height_map,
+    build_height_map_mesh,
+    parse_height_map_file,
+    parse_gcode,
+    remove_consecutive_duplicates_gcode,
+    parse_coordinates,
+    generate_gcode_line,
+    interpolate_segments,
+    interpolate_arcs,
+    compute_gcode_stats,
+    parse_xy_moves,
+    shift_gcode_xy,
+    gcode_xy_bounds,
+    center_offset,
+    StlHeightLookup
+)
+
 # ----------------------- Shared Utility Functions -----------------------
 SETTINGS_FILE = "settings.json"
 
+# Z word in a rapid move, e.g. "Z 5.0", rewritten in place by modify_gcode.
+_Z_WORD_RE = re.compile(r'Z\s*([-+]?\d*\.?\d+)')
+
+# Line templates for interpolated G1 moves written by modify_gcode (matched back by
+# surface_core._G1_MOVE_LINE_RE).
+_G1_XYZ_LINE = "G1 X%.4f Y%.4f Z%.4f\n"
+_G1_XYZF_LINE = "G1 X%.4f Y%.4f Z%.4f F%.1f\n"
+
+_settings_cache = None  # last settings dict loaded from or written to SETTINGS_FILE
+
 def load_settings():
-    if os.path.exists(SETTINGS_FILE):
+    global _settings_cache
+    if _settings_cache is not None:
+        return _settings_cache
+    if os.path.exists(SETTINGS_FILE) and os.path.getsize(SETTINGS_FILE) > 0:
         with open(SETTINGS_FILE, "r") as file:
-            return json.load(file)
+            _settings_cache = json.load(file)
+        return _settings_cache
     else:
         settings = {
             "line_count": 10,
@@ -58,6 +90,8 @@ def load_settings():
         return settings
 
 def save_settings(settings):
+    global _settings_cache
+    _settings_cache = settings
     with open(SETTINGS_FILE, "w") as file:
         json.dump(settings, file, indent=4)
 
@@ -89,115 +123,6 @@ def generate_gcode(line_count, line_spacing, x_length, feed_rate_cut, feed_rate_
     gcode.append("M30")
     return "\n".join(gcode)
 
-def smooth_height_map(height_map, threshold=0.5, max_iterations=10):
-    y_count, x_count = height_map.shape
-    for _ in range(max_iterations):
-        adjusted = False
-        for j in range(y_count):
-            for i in range(x_count):
-                if i < x_count - 1:
-                    diff = height_map[j, i+1] - height_map[j, i]
-                    if abs(diff) > threshold:
-                        mean_val = (height_map[j, i+1] + height_map[j, i]) / 2.0
-                        height_map[j, i] = mean_val
-                        height_map[j, i+1] = mean_val
-                        adjusted = True
-                if j < y_count - 1:
-                    diff = height_map[j+1, i] - height_map[j, i]
-                    if abs(diff) > threshold:
-                        mean_val = (height_map[j+1, i] + height_map[j, i]) / 2.0
-                        height_map[j, i] = mean_val
-                        height_map[j+1, i] = mean_val
-                        adjusted = True
-        if not adjusted:
-            break
-    return height_map
-
-def parse_height_map_file(file_path):
-    with open(file_path, 'r') as f:
-        lines = f.readlines()
-    sections = []
-    current_section = None
-    for line in lines:
-        line = line.strip()
-        if line.startswith("--- Bölüm"):
-            if current_section is not None:
-                sections.append(current_section)
-            current_section = []
-        elif current_section is not None and line:
-            try:
-                current_section.append(float(line))
-            except ValueError:
-                continue
-    if current_section is not None:
-        sections.append(current_section)
-    max_length = max(len(section) for section in sections)
-    height_map = np.full((len(sections), max_length), np.nan)
-    for i, section in enumerate(sections):
-        height_map[i, :len(section)] = section
-    return height_map
-
-def parse_gcode(file_path):
-    coordinates = []
-    current_position = [0.0, 0.0, 0.2]
-    with open(file_path, 'r') as file:
-        lines = file.readlines()
-        for line in lines:
-            line = line.strip()
-            if line.startswith('G1') or line.startswith('G0'):
-                x, y, z = current_position
-                if 'X' in line:
-                    x = float(re.search(r'X([-+]?\d*\.?\d+)', line).group(1))
-                if 'Y' in line:
-                    y = float(re.search(r'Y([-+]?\d*\.?\d+)', line).group(1))
-                if 'Z' in line:
-                    z = float(re.search(r'Z([-+]?\d*\.?\d+)', line).group(1))
-                coordinates.append([x, y, z])
-                current_position = [x, y, z]
-            elif line.startswith('G2') or line.startswith('G3'):
-                gcode_parts = re.findall(r'[XYZIJ][-+]?\d*\.?\d+', line)
-                gcode_parts = {item[0]: float(item[1:]) for item in gcode_parts}
-                x, y, z = current_position
-                i = gcode_parts.get('I', None)
-                j = gcode_parts.get('J', None)
-                end_x = gcode_parts.get('X', x)
-                end_y = gcode_parts.get('Y', y)
-                if i is not None and j is not None:
-                    center_x = x + i
-                    center_y = y + j
-                    radius = np.sqrt(i**2 + j**2)
-                    direction = 'clockwise' if line.startswith('G2') else 'counterclockwise'
-                    num_steps = 20
-                    start_angle = np.arctan2(y - center_y, x - center_x)
-                    end_angle = np.arctan2(end_y - center_y, end_x - center_x)
-                    if direction == 'clockwise':
-                        if end_angle < start_angle:
-                            end_angle += 2 * np.pi
-                    else:
-                        if end_angle > start_angle:
-                            end_angle -= 2 * np.pi
-                    angles = np.linspace(start_angle, end_angle, num_steps)
-                    arc_points = [
-                        (center_x + radius * np.cos(angle),
-                         center_y + radius * np.sin(angle), z)
-                        for angle in angles
-                    ]
-                    coordinates.extend(arc_points)
-                    current_position = [arc_points[-1][0], arc_points[-1][1], z]
-                else:
-                    coordinates.append([end_x, end_y, z])
-                    current_position = [end_x, end_y, z]
-    return np.array(coordinates)
-
-def remove_consecutive_duplicates_gcode(lines):
-    if not lines:
-        return lines
-    filtered = [lines[0]]
-    for line in lines[1:]:
-        if line.strip() != filtered[-1].strip():
-            filtered.append(line)
-    return filtered
-
 # ----------------------- G-Code Editor Widget with STL Viewer -----------------------
 # This widget is adapted from the gcode_editor.py source, with additions to apply offsets based on STL height.
 class GCodeEditorWidget(QWidget):
@@ -209,7 +134,11 @@ class GCodeEditorWidget(QWidget):
         self.modified_gcode = []
         self.center_choice = "Center"
         self.stl_mesh = None           # Currently used STL mesh
-        self.stl_mesh_original = None  # Original STL mesh (for reapplying offsets)
+        # X/Y/Z offset applied on top of the loaded mesh; the mesh itself is never moved.
+        self._stl_offset = np.zeros(3)
+        self._stl_actor = None  # viewer actor of the loaded mesh, moved by the offset
+        # Surface height lookup and bounds of self.stl_mesh, rebuilt whenever it changes.
+        self._stl_lookup = None
         self.initUI()
     
     def initUI(self):
@@ -249,6 +178,10 @@ class GCodeEditorWidget(QWidget):
         self.offset_z_input = QLineEdit(self)
         self.offset_z_input.setGeometry(550, 50, 50, 30)
         self.offset_z_input.setText("0.0")
+        # Offset edits only move the STL actor and refresh the dimension label.
+        self.offset_x_input.textChanged.connect(self.update_stl_offset)
+        self.offset_y_input.textChanged.connect(self.update_stl_offset)
+        self.offset_z_input.textChanged.connect(self.update_stl_offset)
         
         # Labels to show STL dimensions and G-Code stats
         self.stlDimLabel = QLabel("STL Boyutları: (Yüklenmedi)", self)
@@ -317,23 +250,24 @@ class GCodeEditorWidget(QWidget):
         self.plotter.show_bounds()
     
     def update_stl_offset(self):
-        # Reapply the current offset values to the original STL mesh.
-        if self.stl_mesh_original is not None:
-            self.stl_mesh = copy.deepcopy(self.stl_mesh_original)
+        # Read the current offset values; they are applied to Z queries and the reported bounds.
+        if self.stl_mesh is not None:
             try:
                 off_x = float(self.offset_x_input.text())
                 off_y = float(self.offset_y_input.text())
                 off_z = float(self.offset_z_input.text())
             except ValueError:
                 off_x, off_y, off_z = 0.0, 0.0, 0.0
-            self.stl_mesh.vectors += np.array([off_x, off_y, off_z])
-            all_points = self.stl_mesh.vectors.reshape(-1, 3)
-            min_vals = np.min(all_points, axis=0)
-            max_vals = np.max(all_points, axis=0)
+            self._stl_offset = np.array([off_x, off_y, off_z])
+            min_vals, max_vals = self._stl_lookup.bounds + self._stl_offset
             stl_dim_str = (f"X: [{min_vals[0]:.4f}, {max_vals[0]:.4f}]  "
                            f"Y: [{min_vals[1]:.4f}, {max_vals[1]:.4f}]  "
                            f"Z: [{min_vals[2]:.4f}, {max_vals[2]:.4f}]")
             self.stlDimLabel.setText("STL Boyutları: " + stl_dim_str)
+            if self._stl_actor is not None:
+                # The mesh is uploaded once; VTK applies the offset as an actor transform.
+                self._stl_actor.SetPosition(off_x, off_y, off_z)
+                self.plotter.render()
     
     def load_stl(self):
         options = QFileDialog.Options()
@@ -341,16 +275,17 @@ class GCodeEditorWidget(QWidget):
         if file_path:
             try:
                 self.stl_mesh = mesh.Mesh.from_file(file_path)
-                self.stl_mesh_original = copy.deepcopy(self.stl_mesh)
-                self.update_stl_offset()
-                self.status_label.setText(f"STL Yüklendi: {file_path}")
+                self.update_stl_lookup()
                 n_triangles = self.stl_mesh.vectors.shape[0]
-                all_points = self.stl_mesh.vectors.reshape(-1, 3)
-                faces = np.hstack([np.full((n_triangles, 1), 3),
-                                    np.arange(n_triangles * 3).reshape(n_triangles, 3)]).flatten()
-                poly = pv.PolyData(all_points, faces)
+                # Faces in VTK's own id width, so PolyData can take them without converting.
+                faces = np.empty((n_triangles, 4), dtype=pv.ID_TYPE)
+                faces[:, 0] = 3
+                faces[:, 1:] = np.arange(n_triangles * 3, dtype=pv.ID_TYPE).reshape(n_triangles, 3)
+                poly = pv.PolyData(self.stl_mesh.vectors.reshape(-1, 3), faces.ravel())
                 self.plotter.clear()
-                self.plotter.add_mesh(poly, color="lightgray", opacity=0.7)
+                self._stl_actor = self.plotter.add_mesh(poly, color="lightgray", opacity=0.7)
+                self.update_stl_offset()
+                self.status_label.setText(f"STL Yüklendi: {file_path}")
                 self.plotter.reset_camera()
             except Exception as e:
                 QMessageBox.critical(self, "Hata", f"STL yüklenirken hata: {str(e)}")
@@ -366,31 +301,13 @@ class GCodeEditorWidget(QWidget):
                     self.gcode_lines = file.readlines()
                 self.original_text.setPlainText("".join(self.gcode_lines))
                 self.status_label.setText(f"G-Code Yüklendi: {file_path}")
-                dim, count = self.compute_gcode_stats(self.gcode_lines)
+                dim, count = compute_gcode_stats(self.gcode_lines)
                 self.gcodeOrigDimLabel.setText(f"Orijinal G-Code Boyutları: {dim}  Satır Sayısı: {count}")
             except Exception as e:
                 QMessageBox.critical(self, "Hata", f"G-Code yüklenirken hata: {str(e)}")
         else:
             self.status_label.setText("G-Code Yükleme İptal Edildi.")
     
-    def compute_gcode_stats(self, lines):
-        xs, ys, zs = [], [], []
-        pattern = re.compile(r"[Gg][0|1|2].*")
-        for line in lines:
-            if pattern.match(line):
-                coords = self.parse_coordinates(line)
-                if coords.get("X") is not None:
-                    xs.append(coords["X"])
-                if coords.get("Y") is not None:
-                    ys.append(coords["Y"])
-                if coords.get("Z") is not None:
-                    zs.append(coords["Z"])
-        if xs and ys and zs:
-            dim_str = f"X: [{min(xs):.4f}, {max(xs):.4f}]  Y: [{min(ys):.4f}, {max(ys):.4f}]  Z: [{min(zs):.4f}, {max(zs):.4f}]"
-        else:
-            dim_str = "Bilinmiyor"
-        return dim_str, len(lines)
-    
     def save_gcode(self):
         try:
             if not self.stl_mesh or not self.gcode_lines:
@@ -399,6 +316,8 @@ class GCodeEditorWidget(QWidget):
             try:
                 self.interpolation_steps = int(self.steps_input.text())
                 self.arc_steps = int(self.arc_steps_input.text())
+                if self.interpolation_steps < 1 or self.arc_steps < 1:
+                    raise ValueError("steps must be at least 1")
             except ValueError:
                 QMessageBox.warning(self, "Hata", "Ara nokta sayıları geçerli bir sayı olmalıdır.")
                 return
@@ -415,7 +334,7 @@ class GCodeEditorWidget(QWidget):
             self.status_label.setText(f"Güncellenmiş G-Code Kaydedildi: {save_path}")
             QMessageBox.information(self, "Başarılı", "Güncellenmiş G-Code kaydedildi!")
             self.modified_text.setPlainText("".join(self.modified_gcode))
-            dim, count = self.compute_gcode_stats(self.modified_gcode)
+            dim, count = compute_gcode_stats(self.modified_gcode)
             self.gcodeModDimLabel.setText(f"Değiştirilmiş G-Code Boyutları: {dim}  Satır: {count}")
         except Exception as e:
             self.status_label.setText("Kaydetme sırasında hata!")
@@ -445,19 +364,7 @@ class GCodeEditorWidget(QWidget):
             off_y = float(self.offset_y_input.text())
         except ValueError:
             off_x, off_y = 0.0, 0.0
-        new_lines = []
-        pattern = re.compile(r"^(G0|G1)")
-        for line in lines:
-            if pattern.match(line):
-                coords = self.parse_coordinates(line)
-                if coords.get("X") is not None:
-                    coords["X"] += off_x
-                if coords.get("Y") is not None:
-                    coords["Y"] += off_y
-                new_lines.append(self.generate_gcode_line(coords, command=line.split()[0]))
-            else:
-                new_lines.append(line)
-        return new_lines
+        return shift_gcode_xy(lines, off_x, off_y)
     
     def generate_new_gcode(self):
         try:
@@ -467,6 +374,8 @@ class GCodeEditorWidget(QWidget):
             try:
                 self.interpolation_steps = int(self.steps_input.text())
                 self.arc_steps = int(self.arc_steps_input.text())
+                if self.interpolation_steps < 1 or self.arc_steps < 1:
+                    raise ValueError("steps must be at least 1")
             except ValueError:
                 QMessageBox.warning(self, "Hata", "Ara nokta sayıları geçerli bir sayı olmalıdır.")
                 return
@@ -474,7 +383,7 @@ class GCodeEditorWidget(QWidget):
             new_code = self.modify_gcode()
             self.modified_gcode = self.apply_xy_offset_to_gcode(new_code)
             self.modified_text.setPlainText("".join(self.modified_gcode))
-            dim, count = self.compute_gcode_stats(self.modified_gcode)
+            dim, count = compute_gcode_stats(self.modified_gcode)
             self.gcodeModDimLabel.setText(f"Değiştirilmiş G-Code Boyutları: {dim}  Satır: {count}")
             self.status_label.setText("Yeni G-Code oluşturuldu. (Merkez dönüşümü uygulanmadı)")
         except Exception as e:
@@ -491,58 +400,63 @@ class GCodeEditorWidget(QWidget):
     
     def modify_gcode(self):
         new_lines = []
+        # Moves are collected first, then interpolated and given their STL heights in batches;
+        # until then new_lines holds each move's index into moves in place of its lines.
+        segments = []  # (start, end) coordinates of every straight move
+        arcs = []      # (start, end, I, J) of every arc
+        moves = []     # (is_arc, index into segments/arcs, feed, first_cut) in file order
         first_cut = True
         current_pos = {"X": None, "Y": None, "Z": None, "F": None}
-        last_xy = None  # To store last valid X and Y positions
+        last_xy = None  # (X, Y) of the last move with valid X and Y positions
         for line in self.gcode_lines:
+            # Dispatch on the two-character command prefix, sliced once per line.
+            command = line[:2]
+            if command not in ("G0", "G1", "G2"):
+                new_lines.append(line)
+                continue
+            # Each motion line is parsed once; the branches below share these results.
+            coords = parse_coordinates(line)
+            z_match = _Z_WORD_RE.search(line) if command == "G0" else None
             # Check for G0 lines that include a Z parameter.
-            if line.startswith("G0") and re.search(r"Z\s*([-+]?\d*\.?\d+)", line):
+            if z_match:
                 # If line has explicit X and Y tokens:
-                if "X" in line and "Y" in line:
-                    coords = self.parse_coordinates(line)
+                if "X" in coords and "Y" in coords:
                     stl_z = self.get_z_height_from_stl(coords["X"], coords["Y"])
                     if stl_z is not None:
-                        new_z = coords["Z"] + stl_z
-                        new_line = re.sub(r"Z\s*([-+]?\d*\.?\d+)", f"Z{new_z:.4f}", line)
+                        # "Z 5.0" (space before the value) is not a parsed word; fall back to the match.
+                        new_z = coords.get("Z", float(z_match.group(1))) + stl_z
+                        new_line = _Z_WORD_RE.sub(f"Z{new_z:.4f}", line)
                         new_lines.append(new_line)
-                        last_xy = {"X": coords["X"], "Y": coords["Y"]}
+                        last_xy = (coords["X"], coords["Y"])
                         continue
                 # Otherwise, if no X/Y in line, use last_xy.
                 elif last_xy is not None:
-                    z_match = re.search(r"Z\s*([-+]?\d*\.?\d+)", line)
-                    if z_match:
-                        orig_z = float(z_match.group(1))
-                        stl_z = self.get_z_height_from_stl(last_xy["X"], last_xy["Y"])
-                        if stl_z is not None:
-                            new_z = orig_z + stl_z
-                            new_line = re.sub(r"Z\s*([-+]?\d*\.?\d+)", f"Z{new_z:.4f}", line)
-                            new_lines.append(new_line)
-                            continue
+                    orig_z = float(z_match.group(1))
+                    stl_z = self.get_z_height_from_stl(*last_xy)
+                    if stl_z is not None:
+                        new_z = orig_z + stl_z
+                        new_line = _Z_WORD_RE.sub(f"Z{new_z:.4f}", line)
+                        new_lines.append(new_line)
+                        continue
             # For other lines starting with G0 or G1,
-            if line.startswith("G0") or line.startswith("G1"):
-                new_coords = self.parse_coordinates(line)
+            if command == "G0" or command == "G1":
+                new_coords = coords
                 for axis in ["X", "Y", "Z", "F"]:
                     new_coords[axis] = (new_coords.get(axis) if new_coords.get(axis) is not None 
                                         else (current_pos.get(axis) if current_pos.get(axis) is not None else 0))
                 if new_coords.get("X") is not None and new_coords.get("Y") is not None:
-                    last_xy = {"X": new_coords["X"], "Y": new_coords["Y"]}
+                    last_xy = (new_coords["X"], new_coords["Y"])
                 if current_pos["X"] is None or current_pos["Y"] is None:
                     current_pos = new_coords
-                    new_lines.append(self.generate_gcode_line(new_coords, command=line.split()[0]))
+                    new_lines.append(generate_gcode_line(new_coords, command=line.split()[0]))
                     continue
-                segment_points = self.interpolate_segment(current_pos, new_coords, steps=self.interpolation_steps)
-                for pt in segment_points:
-                    stl_z = self.get_z_height_from_stl(pt["X"], pt["Y"])
-                    if stl_z is not None:
-                        if first_cut:
-                            pt["Z"] = stl_z  
-                        else:
-                            pt["Z"] = stl_z - abs(pt["Z"])
-                    new_lines.append(self.generate_gcode_line(pt, command="G1"))
+                new_lines.append(len(moves))
+                moves.append((False, len(segments), new_coords.get("F"), first_cut))
+                segments.append((current_pos, new_coords))
                 first_cut = False
                 current_pos = new_coords
-            elif line.startswith("G2"):
-                new_coords = self.parse_coordinates(line)
+            else:  # G2 arc
+                new_coords = coords
                 new_coords["Z"] = new_coords.get("Z", current_pos.get("Z", 0))
                 I = new_coords.get("I")
                 J = new_coords.get("J")
@@ -550,123 +464,61 @@ class GCodeEditorWidget(QWidget):
                     current_pos = new_coords
                     new_lines.append(line)
                     continue
-                arc_points = self.interpolate_arc(current_pos, new_coords, I, J, steps=self.arc_steps)
-                for pt in arc_points:
-                    stl_z = self.get_z_height_from_stl(pt["X"], pt["Y"])
-                    if stl_z is not None:
-                        if first_cut:
-                            pt["Z"] = stl_z
-                        else:
-                            pt["Z"] = stl_z - abs(pt["Z"])
-                    new_lines.append(self.generate_gcode_line(pt, command="G1"))
+                new_lines.append(len(moves))
+                moves.append((True, len(arcs), new_coords.get("F"), first_cut))
+                arcs.append((current_pos, new_coords, I, J))
                 first_cut = False
                 current_pos = new_coords
+        if not moves:
+            return new_lines
+        segment_points = interpolate_segments(segments, steps=self.interpolation_steps)
+        arc_points = interpolate_arcs(arcs, steps=self.arc_steps)
+        move_points = [arc_points[k] if is_arc else segment_points[k] for is_arc, k, _, _ in moves]
+        lengths = [len(pts) for pts in move_points]
+        points = np.concatenate(move_points)
+        first_cut_mask = np.repeat([move[3] for move in moves], lengths)
+        self.apply_stl_heights(points, first_cut_mask)
+        move_points = np.split(points, np.cumsum(lengths)[:-1])
+        output = []
+        for entry in new_lines:
+            if isinstance(entry, int):
+                output.extend(self.format_moves(move_points[entry], moves[entry][2]))
             else:
-                new_lines.append(line)
-        return new_lines
-    
-    def interpolate_segment(self, start, end, steps=10):
-        points = []
-        for i in range(0, steps + 1):
-            factor = i / float(steps)
-            pt = {
-                "X": start["X"] + (end["X"] - start["X"]) * factor,
-                "Y": start["Y"] + (end["Y"] - start["Y"]) * factor,
-                "Z": start["Z"] + (end["Z"] - start["Z"]) * factor,
-                "F": end.get("F"),
-            }
-            points.append(pt)
-        return points
+                output.append(entry)
+        return output
     
-    def interpolate_arc(self, start, end, I, J, steps=10):
-        points = []
-        center_x = start["X"] + (I if I is not None else 0)
-        center_y = start["Y"] + (J if J is not None else 0)
-        radius = np.sqrt((I if I is not None else 0)**2 + (J if J is not None else 0)**2)
-        start_angle = np.arctan2(start["Y"] - center_y, start["X"] - center_x)
-        end_angle = np.arctan2(end["Y"] - center_y, end["X"] - center_x)
-        if end_angle > start_angle:
-            end_angle -= 2 * np.pi
-        delta_angle = end_angle - start_angle
-        for i in range(0, steps + 1):
-            factor = i / float(steps)
-            theta = start_angle + delta_angle * factor
-            x = center_x + radius * np.cos(theta)
-            y = center_y + radius * np.sin(theta)
-            z = start["Z"] + (end["Z"] - start["Z"]) * factor
-            pt = {"X": x, "Y": y, "Z": z, "F": end.get("F")}
-            points.append(pt)
-        return points
+    def update_stl_lookup(self):
+        self._stl_lookup = StlHeightLookup(self.stl_mesh)
     
     def get_z_height_from_stl(self, x, y):
+        z_heights = self.get_z_heights_from_stl(np.array([[x, y]]))
+        return None if z_heights is None else z_heights[0]
+    
+    def get_z_heights_from_stl(self, xy):
+        # xy: (N, 2) array of query points; returns the STL surface height under each.
         try:
             if self.stl_mesh is None:
                 return None
-            centroids = np.mean(self.stl_mesh.vectors, axis=1)
-            distances = np.sqrt((centroids[:, 0] - x)**2 + (centroids[:, 1] - y)**2)
-            nearest_index = np.argmin(distances)
-            z_height = centroids[nearest_index, 2]
-            return z_height
+            if self._stl_lookup is None or self._stl_lookup.mesh is not self.stl_mesh:
+                self.update_stl_lookup()
+            # Shift the queries into mesh coordinates instead of shifting the mesh.
+            return self._stl_lookup.heights(xy - self._stl_offset[:2]) + self._stl_offset[2]
         except Exception as e:
             print(f"Z yüksekliği hesaplanırken hata: {str(e)}")
             return None
     
-    def parse_coordinates(self, line):
-        coords = {}
-        parts = line.strip().split()
-        for part in parts:
-            if part.startswith("X"):
-                try:
-                    coords["X"] = float(part[1:])
-                except ValueError:
-                    coords["X"] = None
-            elif part.startswith("Y"):
-                try:
-                    coords["Y"] = float(part[1:])
-                except ValueError:
-                    coords["Y"] = None
-            elif part.startswith("Z"):
-                try:
-                    coords["Z"] = float(part[1:])
-                except ValueError:
-                    coords["Z"] = None
-            elif part.startswith("F"):
-                try:
-                    coords["F"] = float(part[1:])
-                except ValueError:
-                    coords["F"] = None
-            elif part.startswith("I"):
-                try:
-                    coords["I"] = float(part[1:])
-                except ValueError:
-                    coords["I"] = None
-            elif part.startswith("J"):
-                try:
-                    coords["J"] = float(part[1:])
-                except ValueError:
-                    coords["J"] = None
-            elif part.startswith("S"):
-                try:
-                    coords["S"] = float(part[1:])
-                except ValueError:
-                    coords["S"] = None
-        return coords
+    def apply_stl_heights(self, points, first_cut):
+        # first_cut may be a single flag or one flag per point.
+        stl_zs = self.get_z_heights_from_stl(points[:, :2])
+        if stl_zs is None:
+            return
+        points[:, 2] = np.where(first_cut, stl_zs, stl_zs - np.abs(points[:, 2]))
     
-    def generate_gcode_line(self, coords, command="G1"):
-        # Rebuild the line preserving additional tokens (like S for spindle speed)
-        line = f"{command}"
-        if coords.get("X") is not None:
-            line += f" X{coords['X']:.4f}"
-        if coords.get("Y") is not None:
-            line += f" Y{coords['Y']:.4f}"
-        if coords.get("Z") is not None:
-            line += f" Z{coords['Z']:.4f}"
-        if coords.get("F") is not None:
-            line += f" F{coords['F']:.1f}"
-        if coords.get("S") is not None:
-            line += f" S{int(coords['S'])}"
-        line += "\n"
-        return line
+    def format_moves(self, points, feed):
+        # Same output as generate_gcode_line for interpolated points, with one %-format per line.
+        if feed is None:
+            return [_G1_XYZ_LINE % (x, y, z) for x, y, z in points.tolist()]
+        return [_G1_XYZF_LINE % (x, y, z, feed) for x, y, z in points.tolist()]
     
     def radio_button_changed(self):
         for text, rb in self.radio_buttons.items():
@@ -678,109 +530,136 @@ class GCodeEditorWidget(QWidget):
         if not self.modified_gcode:
             QMessageBox.warning(self, "Uyarı", "Önce yeni G-Code oluşturup kaydedin!")
             return
-        xs, ys = [], []
-        pattern = re.compile(r"^(G0|G1)")
-        for line in self.modified_gcode:
-            if pattern.match(line):
-                coords = self.parse_coordinates(line)
-                if coords.get("X") is not None:
-                    xs.append(coords["X"])
-                if coords.get("Y") is not None:
-                    ys.append(coords["Y"])
-        if not xs or not ys:
+        # Parsed once; the bounds and the rewrite both work from the cached result.
+        parsed = parse_xy_moves(self.modified_gcode)
+        bounds = gcode_xy_bounds(self.modified_gcode, parsed)
+        if bounds is None:
             QMessageBox.warning(self, "Uyarı", "Dönüştürülecek koordinat bulunamadı!")
             return
-        min_x, max_x = min(xs), max(xs)
-        min_y, max_y = min(ys), max(ys)
-        current_center = ((min_x + max_x) / 2, (min_y + max_y) / 2)
-        if self.center_choice == "Top-Left":
-            desired_center = (min_x, max_y)
-        elif self.center_choice == "Top-Center":
-            desired_center = ((min_x + max_x) / 2, max_y)
-        elif self.center_choice == "Top-Right":
-            desired_center = (max_x, max_y)
-        elif self.center_choice == "Middle-Left":
-            desired_center = (min_x, (min_y + max_y) / 2)
-        elif self.center_choice == "Center":
-            desired_center = ((min_x + max_x) / 2, (min_y + max_y) / 2)
-        elif self.center_choice == "Middle-Right":
-            desired_center = (max_x, (min_y + max_y) / 2)
-        elif self.center_choice == "Bottom-Left":
-            desired_center = (min_x, min_y)
-        elif self.center_choice == "Bottom-Center":
-            desired_center = ((min_x + max_x) / 2, min_y)
-        elif self.center_choice == "Bottom-Right":
-            desired_center = (max_x, min_y)
-        else:
-            desired_center = current_center
-        offset_x = desired_center[0] - current_center[0]
-        offset_y = desired_center[1] - current_center[1]
-        transformed_lines = []
-        for line in self.modified_gcode:
-            if pattern.match(line):
-                coords = self.parse_coordinates(line)
-                if coords.get("X") is not None:
-                    coords["X"] += offset_x
-                if coords.get("Y") is not None:
-                    coords["Y"] += offset_y
-                transformed_lines.append(self.generate_gcode_line(coords, command=line.split()[0]))
-            else:
-                transformed_lines.append(line)
-        self.modified_gcode = transformed_lines
+        offset_x, offset_y = center_offset(bounds, self.center_choice)
+        self.modified_gcode = shift_gcode_xy(self.modified_gcode, offset_x, offset_y, parsed)
         self.modified_text.setPlainText("".join(self.modified_gcode))
-        dim, count = self.compute_gcode_stats(self.modified_gcode)
+        dim, count = compute_gcode_stats(self.modified_gcode)
         self.gcodeModDimLabel.setText(f"Değiştirilmiş G-Code Boyutları: {dim}  Satır: {count}")
         self.status_label.setText("Merkez dönüşümü uygulandı.")
     
     def apply_center_offset(self, lines):
-        xs, ys = [], []
-        pattern = re.compile(r"^(G0|G1)")
-        for line in lines:
-            if pattern.match(line):
-                coords = self.parse_coordinates(line)
-                if coords.get("X") is not None:
-                    xs.append(coords["X"])
-                if coords.get("Y") is not None:
-                    ys.append(coords["Y"])
-        if not xs or not ys:
+        parsed = parse_xy_moves(lines)
+        bounds = gcode_xy_bounds(lines, parsed)
+        if bounds is None:
             return lines
-        min_x, max_x = min(xs), max(xs)
-        min_y, max_y = min(ys), max(ys)
-        current_center = ((min_x + max_x) / 2, (min_y + max_y) / 2)
-        if self.center_choice == "Top-Left":
-            desired_center = (min_x, max_y)
-        elif self.center_choice == "Top-Center":
-            desired_center = ((min_x + max_x) / 2, max_y)
-        elif self.center_choice == "Top-Right":
-            desired_center = (max_x, max_y)
-        elif self.center_choice == "Middle-Left":
-            desired_center = (min_x, (min_y + max_y) / 2)
-        elif self.center_choice == "Center":
-            desired_center = ((min_x + max_x) / 2, (min_y + max_y) / 2)
-        elif self.center_choice == "Middle-Right":
-            desired_center = (max_x, (min_y + max_y) / 2)
-        elif self.center_choice == "Bottom-Left":
-            desired_center = (min_x, min_y)
-        elif self.center_choice == "Bottom-Center":
-            desired_center = ((min_x + max_x) / 2, min_y)
-        elif self.center_choice == "Bottom-Right":
-            desired_center = (max_x, min_y)
-        else:
-            desired_center = current_center
-        offset_x = desired_center[0] - current_center[0]
-        offset_y = desired_center[1] - current_center[1]
-        transformed_lines = []
-        for line in lines:
-            if pattern.match(line):
-                coords = self.parse_coordinates(line)
-                if coords.get("X") is not None:
-                    coords["X"] += offset_x
-                if coords.get("Y") is not None:
-                    coords["Y"] += offset_y
-                transformed_lines.append(self.generate_gcode_line(coords, command=line.split()[0]))
-            else:
-                transformed_lines.append(line)
-        return transformed_lines
+        offset_x, offset_y = center_offset(bounds, self.center_choice)
+        return shift_gcode_xy(lines, offset_x, offset_y, parsed)
+
+# ----------------------- Serial Monitor Thread -----------------------
+# Reads sensor samples from the serial port and emits monitor text to the GUI thread.
+# Writes to data.txt go through a bounded queue to a separate writer thread so slow
+# disk I/O never stalls the serial reads.
+class SerialReader(QtCore.QThread):
+    output = QtCore.pyqtSignal(str)
+    
+    def __init__(self, serial_connection, data_file_path, zero_point, parent=None):
+        super().__init__(parent)
+        self.serial_connection = serial_connection
+        self.data_file_path = data_file_path
+        self.zero_point = zero_point
+        self.write_queue = queue.Queue(maxsize=4096)
+    
+    def run(self):
+        try:
+            file = open(self.data_file_path, "w")
+        except OSError as e:
+            self.output.emit(f"Error: {e}")
+            return
+        writer = threading.Thread(target=self.write_data, args=(file,), daemon=True)
+        writer.start()
+        # Monitor lines are sent to the GUI in batches: every append relayouts the text box.
+        pending = []
+        try:
+            section_counter = 1
+            last_data_time = time.time()
+            is_reading = False
+            zero_point = self.zero_point
+            mm_per_count = 0.01
+            self.write_queue.put(f"--- Section {section_counter} ---\n")
+            buffer = bytearray()
+            last_emit_time = time.time()
+            while self.serial_connection.is_open:
+                # Drain everything the OS has buffered in one call; block briefly (port timeout) when idle.
+                buffer += self.serial_connection.read(self.serial_connection.in_waiting or 1)
+                lines = buffer.split(b"\n")
+                buffer = lines.pop()  # keep the trailing partial line for the next read
+                heights = []
+                for raw in lines:
+                    # int() takes the bytes directly, so no decode pass. Only plain digit samples count,
+                    # as before: int() alone would also take signs and underscores from line noise.
+                    raw = raw.strip()
+                    if not raw.isdigit():
+                        continue
+                    sensor_value = int(raw)
+                    height_mm = (sensor_value - zero_point) * mm_per_count
+                    pending.append(f"Sensor: {sensor_value}, Height: {height_mm:.2f} mm")
+                    heights.append(f"{height_mm:.2f}\n")
+                if heights:
+                    self.write_queue.put("".join(heights))
+                    last_data_time = time.time()
+                    is_reading = True
+                if is_reading and (time.time() - last_data_time > 0.5):
+                    section_counter += 1
+                    pending.append(f"--- Section {section_counter} ---")
+                    self.write_queue.put(f"\n--- Section {section_counter} ---\n")
+                    is_reading = False
+                if pending and (len(pending) >= 32 or time.time() - last_emit_time > 0.1):
+                    self.output.emit("\n".join(pending))
+                    pending = []
+                    last_emit_time = time.time()
+        except Exception as e:
+            # A blocking read is interrupted when the port is closed from stop_serial_read.
+            if self.serial_connection.is_open:
+                self.output.emit(f"Error: {e}")
+        finally:
+            if pending:
+                self.output.emit("\n".join(pending))
+            self.write_queue.put(None)
+            writer.join()
+    
+    def write_data(self, file):
+        with file:
+            while True:
+                text = self.write_queue.get()
+                if text is None:
+                    break
+                file.write(text)
+                # Flush only once the backlog is drained rather than after every sample.
+                if self.write_queue.empty():
+                    file.flush()
+
+# ----------------------- Mesh Build Thread -----------------------
+# Builds the height-map surface mesh (smoothing a copy of the map first if asked) off the
+# GUI thread so large maps don't freeze the window; the result is rendered in the GUI thread.
+class MeshBuilder(QtCore.QThread):
+    built = QtCore.pyqtSignal(object, object, object, object)
+    failed = QtCore.pyqtSignal(str)
+    
+    def __init__(self, height_map, x_step, y_step, smooth=False, parent=None):
+        super().__init__(parent)
+        self.height_map = height_map
+        self.x_step = x_step
+        self.y_step = y_step
+        self.smooth = smooth
+    
+    def run(self):
+        try:
+            height_map = self.height_map
+            if self.smooth:
+                height_map = smooth_height_map(height_map.copy(), threshold=0.5, max_iterations=10)
+            vertices, faces = build_height_map_mesh(height_map, self.x_step, self.y_step)
+            stl_mesh = mesh.Mesh(np.zeros(faces.shape[0], dtype=mesh.Mesh.dtype))
+            stl_mesh.vectors[:] = vertices[faces]
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.built.emit(height_map, vertices, faces, stl_mesh)
 
 # ----------------------- Combine (Surface & STL) Widget -----------------------
 # This widget is adapted from the combine1.py source.
@@ -793,6 +672,36 @@ class CombineWidget(QWidget):
         self.gcode_path = None
         self.x_step = 2.0
         self.y_step = 3.0
+        # Render caches: the mesh is rebuilt only when the height map or steps change,
+        # and the G-code toolpath is reparsed and rebuilt only when its path or mtime changes.
+        self._mesh_cache_key = None
+        self._poly_data = None
+        self._gcode_cache_key = None
+        self._gcode_path_data = None
+        # Scene actors are kept between redraws: property edits restyle them, a step change only
+        # moves the mesh points, and an actor is replaced only when its topology or file changes.
+        self._mesh_faces = None
+        self._mesh_actor = None
+        self._gcode_actor = None
+        self._gcode_shown = None
+        # Only one mesh build runs at a time; requests made meanwhile are folded into one follow-up build.
+        self._mesh_worker = None
+        self._mesh_pending = False
+        self._smooth_pending = False
+        # Step/dimension edits fire per keystroke, so wait for typing to pause before rebuilding.
+        self._view_timer = QtCore.QTimer(self)
+        self._view_timer.setSingleShot(True)
+        self._view_timer.setInterval(150)
+        self._view_timer.timeout.connect(self.update_view)
+        # Coalesce rapid settings edits into a single write to disk.
+        self._save_timer = QtCore.QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(500)
+        self._save_timer.timeout.connect(self.flush_settings)
+        QApplication.instance().aboutToQuit.connect(self.flush_pending_settings)
+        # A QThread still running when the widget is destroyed aborts the process; stop it first.
+        QApplication.instance().aboutToQuit.connect(self.stop_serial_reader)
+        QApplication.instance().aboutToQuit.connect(self.wait_for_mesh_worker)
         self.initUI()
     
     def initUI(self):
@@ -994,7 +903,7 @@ class CombineWidget(QWidget):
         try:
             self.x_step = float(self.xStepInput.text())
             self.y_step = float(self.yStepInput.text())
-            self.update_view()
+            self._view_timer.start()
         except ValueError:
             pass
     
@@ -1005,7 +914,7 @@ class CombineWidget(QWidget):
                 _, x_count = self.height_map.shape
                 self.x_step = x_dimension / (x_count - 1)
                 self.xStepInput.setText(str(self.x_step))
-                self.update_view()
+                self._view_timer.start()
         except ValueError:
             pass
     
@@ -1016,7 +925,7 @@ class CombineWidget(QWidget):
                 y_count, _ = self.height_map.shape
                 self.y_step = y_dimension / (y_count - 1)
                 self.yStepInput.setText(str(self.y_step))
-                self.update_view()
+                self._view_timer.start()
         except ValueError:
             pass
     
@@ -1026,6 +935,7 @@ class CombineWidget(QWidget):
             return
         try:
             self.height_map = parse_height_map_file(data_file)
+            self._mesh_cache_key = None
             self.update_view()
             self.saveButton.setEnabled(True)
             self.smoothButton.setEnabled(True)
@@ -1036,8 +946,7 @@ class CombineWidget(QWidget):
         if self.height_map is None:
             QMessageBox.warning(self, "Warning", "No data loaded.")
             return
-        self.height_map = smooth_height_map(self.height_map, threshold=0.5, max_iterations=10)
-        self.update_view()
+        self.start_mesh_build(smooth=True)
     
     def update_model_dimensions(self, vertices):
         x_min, x_max = vertices[:, 0].min(), vertices[:, 0].max()
@@ -1048,53 +957,100 @@ class CombineWidget(QWidget):
     def update_view(self):
         if self.height_map is None:
             return
-        vertices, faces, stl_mesh = self.create_stl_mesh_from_height_map()
+        key = (id(self.height_map), self.x_step, self.y_step)
+        if key != self._mesh_cache_key:
+            # The view is redrawn from on_mesh_built once the new mesh is ready.
+            self.start_mesh_build()
+            return
+        self.render_view()
+    
+    def start_mesh_build(self, smooth=False):
+        if self._mesh_worker is not None:
+            self._mesh_pending = True
+            self._smooth_pending = self._smooth_pending or smooth
+            return
+        worker = MeshBuilder(self.height_map, self.x_step, self.y_step, smooth, self)
+        worker.built.connect(self.on_mesh_built)
+        worker.failed.connect(self.on_mesh_failed)
+        worker.finished.connect(self.on_mesh_worker_finished)
+        worker.finished.connect(worker.deleteLater)
+        self._mesh_worker = worker
+        worker.start()
+    
+    def on_mesh_built(self, height_map, vertices, faces, stl_mesh):
+        worker = self._mesh_worker
+        if worker.height_map is not self.height_map:
+            return  # a new file was loaded meanwhile; the pending build replaces this one
+        self.height_map = height_map
         self.current_stl_mesh = stl_mesh
         self.update_model_dimensions(vertices)
-        face_data = np.hstack([np.full((faces.shape[0], 1), 3), faces]).flatten()
-        poly_data = pv.PolyData(vertices, face_data)
+        if self._mesh_actor is not None and np.array_equal(faces, self._mesh_faces):
+            # Same grid and NaN pattern: only the coordinates moved.
+            self._poly_data.points = vertices
+            # The actor draws a smooth-shaded copy; its point normals belong to the old heights.
+            shaded = pv.wrap(self._mesh_actor.GetMapper().GetInput())
+            shaded.points = vertices
+            shaded.compute_normals(cell_normals=False, split_vertices=False, inplace=True)
+            shaded.Modified()
+        else:
+            face_data = np.hstack([np.full((faces.shape[0], 1), 3), faces]).flatten()
+            self._poly_data = pv.PolyData(vertices, face_data)
+            self._mesh_faces = faces
+            if self._mesh_actor is not None:
+                self.plotter.remove_actor(self._mesh_actor)
+                self._mesh_actor = None
+        self._mesh_cache_key = (id(height_map), worker.x_step, worker.y_step)
+        self.render_view(geometry_changed=True)
+    
+    def on_mesh_failed(self, message):
+        QMessageBox.critical(self, "Error", f"Failed to build mesh: {message}")
+    
+    def wait_for_mesh_worker(self):
+        # A build can't be interrupted; drop any queued one and let the running one finish.
+        self._mesh_pending = False
+        self._smooth_pending = False
+        if self._mesh_worker is not None:
+            self._mesh_worker.wait()
+    
+    def on_mesh_worker_finished(self):
+        self._mesh_worker = None
+        if self._mesh_pending:
+            smooth = self._smooth_pending
+            self._mesh_pending = False
+            self._smooth_pending = False
+            if smooth:
+                self.start_mesh_build(smooth=True)
+            else:
+                self.update_view()
+    
+    def render_view(self, geometry_changed=False):
         show_edges = self.showEdgesCheck.isChecked()
         color = self.colorCombo.currentText()
-        self.plotter.clear()
-        self.plotter.add_mesh(poly_data, show_edges=show_edges, color=color,
-                              smooth_shading=True, lighting=False, ambient=False, diffuse=True, specular=True)
-        if self.gcode_path:
-            coordinates = parse_gcode(self.gcode_path)
-            self.plot_gcode(coordinates)
-        self.plotter.reset_camera()
+        if self._mesh_actor is None:
+            self._mesh_actor = self.plotter.add_mesh(self._poly_data, show_edges=show_edges, color=color,
+                                                     smooth_shading=True, lighting=False, ambient=False, diffuse=True, specular=True)
+            geometry_changed = True
+        else:
+            prop = self._mesh_actor.GetProperty()
+            prop.SetEdgeVisibility(show_edges)
+            prop.SetColor(pv.Color(color).float_rgb)
+        if self.gcode_path and self.plot_gcode(self.get_gcode_path_data()):
+            geometry_changed = True
+        if geometry_changed:
+            self.plotter.reset_camera()
+        self.plotter.render()
     
-    def create_stl_mesh_from_height_map(self):
-        y_count, x_count = self.height_map.shape
-        x_coords = np.arange(0, x_count * self.x_step, self.x_step)
-        y_coords = np.arange(0, y_count * self.y_step, self.y_step)
-        vertices = []
-        for j in range(y_count):
-            for i in range(x_count):
-                if not np.isnan(self.height_map[j, i]):
-                    x_val = x_coords[i]
-                    y_val = y_coords[j]
-                    z_val = self.height_map[j, i]
-                    vertices.append([x_val, y_val, z_val])
-        vertices = np.array(vertices)
-        center = np.mean(vertices, axis=0)
-        vertices -= center
-        faces = []
-        for j in range(y_count - 1):
-            for i in range(x_count - 1):
-                if not (np.isnan(self.height_map[j, i]) or np.isnan(self.height_map[j, i+1]) or
-                        np.isnan(self.height_map[j+1, i]) or np.isnan(self.height_map[j+1, i+1])):
-                    v0 = j * x_count + i
-                    v1 = j * x_count + (i + 1)
-                    v2 = (j + 1) * x_count + i
-                    v3 = (j + 1) * x_count + (i + 1)
-                    faces.append([v0, v1, v2])
-                    faces.append([v2, v1, v3])
-        faces = np.array(faces)
-        stl_mesh = mesh.Mesh(np.zeros(faces.shape[0], dtype=mesh.Mesh.dtype))
-        for idx, f in enumerate(faces):
-            for k in range(3):
-                stl_mesh.vectors[idx][k] = vertices[f[k], :]
-        return vertices, faces, stl_mesh
+    def get_gcode_path_data(self):
+        try:
+            key = (self.gcode_path, os.path.getmtime(self.gcode_path))
+        except OSError:
+            return self._gcode_path_data  # file moved or deleted since loading; keep the last toolpath
+        if key != self._gcode_cache_key:
+            coordinates = parse_gcode(self.gcode_path)
+            # One polyline through all points; the same PolyData is re-added on every redraw.
+            self._gcode_path_data = pv.lines_from_points(coordinates) if coordinates.shape[0] > 1 else None
+            self._gcode_cache_key = key
+        return self._gcode_path_data
     
     def save_stl(self):
         if self.current_stl_mesh is None:
@@ -1120,17 +1076,33 @@ class CombineWidget(QWidget):
     def set_side_view(self):
         self.plotter.view_yz()
     
-    def plot_gcode(self, coordinates):
-        if coordinates.shape[0] > 1:
-            lines = np.vstack([coordinates[:-1], coordinates[1:]])
-            self.plotter.add_lines(lines, color="red", width=2)
+    def plot_gcode(self, path_data):
+        # Returns True if the toolpath actor was replaced; an unchanged toolpath keeps its actor.
+        if path_data is self._gcode_shown:
+            return False
+        if self._gcode_actor is not None:
+            self.plotter.remove_actor(self._gcode_actor)
+            self._gcode_actor = None
+        if path_data is not None:
+            self._gcode_actor = self.plotter.add_mesh(path_data, color="red", line_width=2)
+        self._gcode_shown = path_data
+        return True
     
     def browse_directory(self):
         directory = QFileDialog.getExistingDirectory(self, "Select Directory", self.settings["save_directory"])
         if directory:
             self.save_directory_input.setText(directory)
             self.settings["save_directory"] = directory
-            save_settings(self.settings)
+            self._save_timer.start()
+    
+    def flush_settings(self):
+        save_settings(self.settings)
+    
+    def flush_pending_settings(self):
+        # Make sure a write still waiting on the debounce timer is not lost on exit.
+        if self._save_timer.isActive():
+            self._save_timer.stop()
+            self.flush_settings()
     
     def refresh_ports(self):
         available_ports = [port.portName() for port in QSerialPortInfo.availablePorts() if port.portName() != "COM1"]
@@ -1149,7 +1121,9 @@ class CombineWidget(QWidget):
             self.settings["feed_rate_rapid"] = float(self.feed_rate_rapid_input.text())
             self.settings["dwell_time"] = int(self.dwell_time_input.text())
             self.settings["baud_rate"] = int(self.baud_rate_input.text())
-            save_settings(self.settings)
+            # An explicit save is written now, so the confirmation below is true when it shows.
+            self._save_timer.stop()
+            self.flush_settings()
             QMessageBox.information(self, "Success", "All settings have been saved.")
         except ValueError:
             QMessageBox.warning(self, "Error", "Invalid input value. Please check your entries.")
@@ -1181,50 +1155,31 @@ class CombineWidget(QWidget):
         try:
             port_name = self.serial_port_combo.currentText()
             baud_rate = int(self.baud_rate_input.text())
-            self.serial_connection = serial.Serial(port_name, baud_rate, timeout=1)
-            self.serial_thread = threading.Thread(target=self.read_serial_data, daemon=True)
+            self.serial_connection = serial.Serial(port_name, baud_rate, timeout=0.1)
+            data_file_path = os.path.join(self.settings["save_directory"], "data.txt")
+            self.serial_thread = SerialReader(self.serial_connection, data_file_path,
+                                              self.settings.get("zero_point", 8150), self)
+            self.serial_thread.output.connect(self.serial_output.append)
             self.serial_thread.start()
             QMessageBox.information(self, "Info", "Serial monitor started.")
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to start serial monitor: {e}")
     
-    def read_serial_data(self):
-        try:
-            section_counter = 1
-            last_data_time = time.time()
-            is_reading = False
-            data_file_path = os.path.join(self.settings["save_directory"], "data.txt")
-            with open(data_file_path, "w") as file:
-                file.write(f"--- Section {section_counter} ---\n")
-                while self.serial_connection.is_open:
-                    if self.serial_connection.in_waiting > 0:
-                        raw_line = self.serial_connection.readline().decode('utf-8', errors='replace').strip()
-                        if raw_line.isdigit():
-                            sensor_value = int(raw_line)
-                            zero_point = self.settings.get("zero_point", 8150)
-                            height_mm = (sensor_value - zero_point) * 0.01
-                            output = f"Sensor: {sensor_value}, Height: {height_mm:.2f} mm"
-                            self.serial_output.append(output)
-                            file.write(f"{height_mm:.2f}\n")
-                            file.flush()
-                            last_data_time = time.time()
-                            is_reading = True
-                    if is_reading and (time.time() - last_data_time > 0.5):
-                        section_counter += 1
-                        self.serial_output.append(f"--- Section {section_counter} ---")
-                        file.write(f"\n--- Section {section_counter} ---\n")
-                        file.flush()
-                        is_reading = False
-        except Exception as e:
-            self.serial_output.append(f"Error: {e}")
-    
     def stop_serial_read(self):
         try:
-            if hasattr(self, 'serial_connection') and self.serial_connection.is_open:
-                self.serial_connection.close()
+            if self.stop_serial_reader():
                 QMessageBox.information(self, "Info", "Serial monitor stopped.")
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to stop serial monitor: {e}")
+    
+    def stop_serial_reader(self):
+        # Closing the port ends the reader's loop; run() joins its writer thread before returning,
+        # so wait() also covers the pending data-file writes. Returns whether a monitor was running.
+        if not (hasattr(self, 'serial_connection') and self.serial_connection.is_open):
+            return False
+        self.serial_connection.close()
+        self.serial_thread.wait()
+        return True
 
 # ----------------------- Main Window with Tabs -----------------------
 class MainWindow(QMainWindow):
@@ -1,15 +1,72 @@
 import sys
+from collections import deque
+import numpy as np
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QLabel, QLineEdit, QSpinBox,
     QDoubleSpinBox, QFontComboBox, QCheckBox, QPushButton, QGraphicsScene,
     QGraphicsPathItem, QDialog, QGraphicsView, QGridLayout, QFileDialog,
-    QGraphicsLineItem, QGraphicsItemGroup, QGraphicsEllipseItem
+    QGraphicsLineItem, QGraphicsItemGroup, QGraphicsEllipseItem, QOpenGLWidget, QGraphicsItem,
+    QVBoxLayout, QHBoxLayout
 )
 from PyQt5.QtGui import (QFont, QPainterPath, QPen, QFontMetrics, QPainter,
-                         QPainterPathStroker, QTransform, QKeySequence)
-from PyQt5.QtCore import Qt, QPointF, QSettings, QTimer, QTime
+                         QPainterPathStroker, QTransform, QKeySequence, QSurfaceFormat)
+from PyQt5.QtCore import Qt, QPointF, QSettings, QTimer, QTime, QThread, pyqtSignal
 import ezdxf
 
+# QPolygonF stores its points as consecutive (x, y) doubles; view them as an (n, 2) array instead of
+# wrapping each point in a QPointF.
+def polygon_points(polygon):
+    buffer = polygon.data()
+    buffer.setsize(polygon.size() * 2 * 8)
+    return np.frombuffer(buffer, dtype=np.float64).reshape(-1, 2)
+
+# Letters plus the two rings: outer circles added, holes cut out. The circles that reach the letters
+# (or each other) go in as one winding-filled path each for outer and inner, so the large letter path
+# sees one union and one difference. A ring whose bounds touch nothing else is cut on its own and
+# appended, keeping it out of the boolean ops on the letters.
+def combine_outline(letters_path, left_outer, right_outer, left_inner, right_inner):
+    letters_rect = letters_path.boundingRect()
+    rings = ((left_outer, left_inner), (right_outer, right_inner))
+    outer = QPainterPath()
+    outer.setFillRule(Qt.WindingFill)
+    inner = QPainterPath()
+    inner.setFillRule(Qt.WindingFill)
+    separate = []
+    for index, (ring_outer, ring_inner) in enumerate(rings):
+        rect = ring_outer.boundingRect()
+        if rect.intersects(letters_rect) or rect.intersects(rings[1 - index][0].boundingRect()):
+            outer.addPath(ring_outer)
+            inner.addPath(ring_inner)
+        else:
+            separate.append(ring_outer.subtracted(ring_inner))
+    # The letter outlines may overlap each other, so they always go through one boolean op.
+    combined = letters_path.united(outer) if not outer.isEmpty() else letters_path.simplified()
+    if not inner.isEmpty():
+        combined = combined.subtracted(inner)
+    for ring in separate:
+        combined.addPath(ring)
+    return combined
+
+# A deep copy of path. QPainterPath(path) only shares the data, and boundingRect() caches its result
+# in that shared data, so a shallow copy used on another thread races with the GUI thread.
+def detached_path(path):
+    copy = QPainterPath()
+    copy.addPath(path)
+    copy.setFillRule(path.fillRule())
+    return copy
+
+# Runs combine_outline off the GUI thread; QPainterPath is reentrant and the inputs are deep copies,
+# made here on the GUI thread.
+class OutlineBuilder(QThread):
+    built = pyqtSignal(object)
+
+    def __init__(self, paths, parent=None):
+        super().__init__(parent)
+        self.paths = [detached_path(path) for path in paths]
+
+    def run(self):
+        self.built.emit(combine_outline(*self.paths))
+
 # Custom QPushButton for move actions.
 class MoveButton(QPushButton):
     def __init__(self, text, group, dx, dy, move_callback, parent=None):
@@ -20,29 +77,27 @@ class MoveButton(QPushButton):
         self.move_callback = move_callback
         self.long_press_threshold = 300  # ms threshold for long press detection
         self.repeat_interval = 100       # ms repeat interval during long press
-        self.timer = QTimer(self)
-        self.timer.setInterval(self.repeat_interval)
-        self.timer.timeout.connect(self.on_timeout)
-        self.single_shot_timer = QTimer(self)
-        self.single_shot_timer.setSingleShot(True)
-        self.single_shot_timer.timeout.connect(self.start_long_press)
+        # Qt's own auto-repeat emits clicked again every interval while the button is held.
+        self.setAutoRepeat(True)
+        self.setAutoRepeatDelay(self.long_press_threshold)
+        self.setAutoRepeatInterval(self.repeat_interval)
+        self._repeated = False  # set once a hold has auto-repeated
+        self.clicked.connect(self.on_click)
 
     def mousePressEvent(self, event):
-        self.single_shot_timer.start(self.long_press_threshold)
+        # A hold released outside the button sends no final click, so reset on each new press.
+        self._repeated = False
         super().mousePressEvent(event)
 
-    def mouseReleaseEvent(self, event):
-        if self.single_shot_timer.isActive():
-            self.single_shot_timer.stop()
-            self.move_callback(self.group, self.dx, self.dy)
-        else:
-            self.timer.stop()
-        super().mouseReleaseEvent(event)
-
-    def start_long_press(self):
-        self.timer.start()
-
-    def on_timeout(self):
+    def on_click(self):
+        # Repeat clicks arrive while the button is still down. Qt sends one more click on release;
+        # after a long press that one is skipped, so a hold does not overshoot by a step.
+        if self.isDown():
+            self._repeated = True
+        elif self._repeated:
+            self._repeated = False
+            return
+        # dx/dy are read here because load_defaults rescales them after construction.
         self.move_callback(self.group, self.dx, self.dy)
 
 # Custom GraphicsView with rubber band selection.
@@ -52,6 +107,41 @@ class GraphicsView(QGraphicsView):
         self.setRenderHint(QPainter.Antialiasing)
         self.setDragMode(QGraphicsView.RubberBandDrag)
         self._pan = False
+        # Draw through OpenGL so path strokes and fills are not tessellated on the CPU; multisampling
+        # keeps them antialiased. GL viewports need full updates, otherwise moved items leave trails.
+        # A missing GL driver does not raise here; it only shows up once the widget is shown, so
+        # showEvent checks the context and swaps in a raster viewport if it failed.
+        viewport = QOpenGLWidget()
+        surface_format = QSurfaceFormat()
+        surface_format.setSamples(4)
+        viewport.setFormat(surface_format)
+        self.setViewport(viewport)
+        self.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
+        self._viewport_checked = False
+        # Items set their own pen and LetterItem restores its render hint, so skip save()/restore().
+        self.setOptimizationFlag(QGraphicsView.DontSavePainterState, True)
+        # Wheel zoom keeps the point under the cursor in place instead of needing a pan afterwards.
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.horizontalScrollBar().setSingleStep(20)
+        self.verticalScrollBar().setSingleStep(20)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self._viewport_checked:
+            self._viewport_checked = True
+            # The GL context is created while the window is first exposed; check it after that.
+            QTimer.singleShot(0, self.check_gl_viewport)
+
+    def check_gl_viewport(self):
+        viewport = self.viewport()
+        if not isinstance(viewport, QOpenGLWidget):
+            return
+        context = viewport.context()
+        if viewport.isValid() and context is not None and context.isValid():
+            return
+        self.setViewport(QWidget())
+        # Raster fallback: repaint one rect around what changed instead of a merged region.
+        self.setViewportUpdateMode(QGraphicsView.BoundingRectViewportUpdate)
 
     def wheelEvent(self, event):
         zoomFactor = 1.15
@@ -91,23 +181,62 @@ class GraphicsView(QGraphicsView):
 class LetterItem(QGraphicsPathItem):
     line_thickness = 1.0
     show_frame = True
+    # Frame pens shared by all letters; rebuilt only when the thickness changes.
+    selected_pen = None
+    frame_pen = None
+
+    @classmethod
+    def set_line_thickness(cls, thickness, items=()):
+        # Items already on the scene grow or shrink with the pen, so announce it before changing it.
+        if thickness != cls.line_thickness:
+            for item in items:
+                item.prepareGeometryChange()
+        cls.line_thickness = thickness
+        cls.selected_pen = QPen(Qt.red, thickness, Qt.SolidLine)
+        cls.frame_pen = QPen(Qt.black, thickness, Qt.DashLine)
 
     def __init__(self, path, letter):
         super().__init__(path)
         self.letter = letter
+        self._scene_path = None
+        self._scene_pos = None
+        self._frame_rect = path.boundingRect()
         self.setFlags(QGraphicsPathItem.ItemIsSelectable)
         self.setPen(QPen(Qt.NoPen))
+        # Panning blits the cached pixmap; setPath/update (selection, frame toggle) refresh it.
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+
+    def setPath(self, path):
+        self.prepareGeometryChange()
+        super().setPath(path)
+        self._scene_path = None
+        self._frame_rect = path.boundingRect()
+
+    def boundingRect(self):
+        # Half of the frame stroke lies outside _frame_rect, and the device cache clips to this rect.
+        margin = LetterItem.line_thickness / 2
+        return self._frame_rect.adjusted(-margin, -margin, margin, margin)
+
+    def scene_path(self):
+        # Outline in scene coordinates, remapped only after the letter moved or got a new path.
+        pos = self.pos()
+        if self._scene_path is None or pos != self._scene_pos:
+            self._scene_path = self.mapToScene(self.path())
+            self._scene_pos = pos
+        return self._scene_path
 
     def paint(self, painter, option, widget):
         if not LetterItem.show_frame:
             return
-        rect = self.path().boundingRect()
-        if self.isSelected():
-            pen = QPen(Qt.red, LetterItem.line_thickness, Qt.SolidLine)
-        else:
-            pen = QPen(Qt.black, LetterItem.line_thickness, Qt.DashLine)
-        painter.setPen(pen)
+        rect = self._frame_rect
+        if LetterItem.frame_pen is None:
+            LetterItem.set_line_thickness(LetterItem.line_thickness)
+        painter.setPen(LetterItem.selected_pen if self.isSelected() else LetterItem.frame_pen)
+        # The frame is axis-aligned, so antialiasing only costs time here.
+        antialiased = painter.testRenderHint(QPainter.Antialiasing)
+        painter.setRenderHint(QPainter.Antialiasing, False)
         painter.drawRect(rect)
+        painter.setRenderHint(QPainter.Antialiasing, antialiased)
 
     def shape(self):
         path = self.path()
@@ -129,89 +258,90 @@ class SettingsDialog(QDialog):
 
     def init_ui(self):
         self.labelFont = QLabel("Varsayılan Font:", self)
-        self.labelFont.setGeometry(20, 10, 150, 20)
         self.defaultFontCombo = QFontComboBox(self)
-        self.defaultFontCombo.setGeometry(20, 30, 200, 30)
 
         self.labelFontSize = QLabel("Varsayılan Font Boyutu:", self)
-        self.labelFontSize.setGeometry(20, 70, 150, 20)
         self.defaultFontSizeSpin = QSpinBox(self)
         self.defaultFontSizeSpin.setRange(5, 100)
-        self.defaultFontSizeSpin.setGeometry(20, 90, 100, 30)
 
         self.labelCircleDiam = QLabel("Varsayılan Dış Çap:", self)
-        self.labelCircleDiam.setGeometry(20, 130, 150, 20)
         self.defaultCircleDiameterSpin = QSpinBox(self)
         self.defaultCircleDiameterSpin.setRange(1, 200)
-        self.defaultCircleDiameterSpin.setGeometry(20, 150, 100, 30)
 
         self.labelInnerRatio = QLabel("Varsayılan Delik Oranı (%):", self)
-        self.labelInnerRatio.setGeometry(20, 190, 180, 20)
         self.defaultInnerRatioSpin = QSpinBox(self)
         self.defaultInnerRatioSpin.setRange(10, 100)
-        self.defaultInnerRatioSpin.setGeometry(20, 210, 100, 30)
 
         self.labelMargin = QLabel("Margin:", self)
-        self.labelMargin.setGeometry(20, 250, 150, 20)
         self.marginSpin = QDoubleSpinBox(self)
         self.marginSpin.setDecimals(4)
         self.marginSpin.setRange(0.0, 100)
         self.marginSpin.setSingleStep(0.01)
-        self.marginSpin.setGeometry(20, 270, 100, 30)
 
         self.labelDashedThickness = QLabel("Kesikli Çizgi Kalınlığı:", self)
-        self.labelDashedThickness.setGeometry(20, 310, 180, 20)
         self.dashedThicknessSpin = QDoubleSpinBox(self)
         self.dashedThicknessSpin.setDecimals(2)
         self.dashedThicknessSpin.setRange(0.1, 10)
         self.dashedThicknessSpin.setSingleStep(0.1)
-        self.dashedThicknessSpin.setGeometry(20, 330, 100, 30)
 
         self.defaultBoldCB = QCheckBox("Varsayılan Kalın", self)
-        self.defaultBoldCB.setGeometry(250, 30, 150, 30)
         self.defaultItalicCB = QCheckBox("Varsayılan İtalik", self)
-        self.defaultItalicCB.setGeometry(250, 70, 150, 30)
 
         self.labelLineThickness = QLabel("Union Çizgi Kalınlığı:", self)
-        self.labelLineThickness.setGeometry(250, 110, 180, 20)
         self.defaultLineThicknessSpin = QDoubleSpinBox(self)
         self.defaultLineThicknessSpin.setDecimals(2)
         self.defaultLineThicknessSpin.setRange(0.1, 10)
         self.defaultLineThicknessSpin.setSingleStep(0.1)
-        self.defaultLineThicknessSpin.setGeometry(250, 130, 100, 30)
 
         self.labelLetterStep = QLabel("Harf Kaydırma Adımı:", self)
-        self.labelLetterStep.setGeometry(250, 170, 180, 20)
         self.letterStepSpin = QDoubleSpinBox(self)
         self.letterStepSpin.setDecimals(2)
         self.letterStepSpin.setRange(0.01, 50)
         self.letterStepSpin.setSingleStep(0.01)
-        self.letterStepSpin.setGeometry(250, 190, 100, 30)
 
         self.labelCircleStep = QLabel("Yuvarlak Kaydırma Adımı:", self)
-        self.labelCircleStep.setGeometry(250, 230, 180, 20)
         self.circleStepSpin = QDoubleSpinBox(self)
         self.circleStepSpin.setDecimals(2)
         self.circleStepSpin.setRange(0.01, 50)
         self.circleStepSpin.setSingleStep(0.01)
-        self.circleStepSpin.setGeometry(250, 250, 100, 30)
         
         # New setting: Blue circle pen thickness.
         self.labelBluePen = QLabel("Mavi Yuvarlak Çizgi Kalınlığı:", self)
-        self.labelBluePen.setGeometry(20, 370, 200, 20)
         self.blueCirclePenSpin = QDoubleSpinBox(self)
         self.blueCirclePenSpin.setDecimals(2)
         self.blueCirclePenSpin.setRange(0.01, 5)
         self.blueCirclePenSpin.setSingleStep(0.01)
-        self.blueCirclePenSpin.setGeometry(20, 390, 100, 30)
 
         self.okButton = QPushButton("Kaydet", self)
-        self.okButton.setGeometry(100, 450, 80, 30)
         self.okButton.clicked.connect(self.accept)
         self.cancelButton = QPushButton("İptal", self)
-        self.cancelButton.setGeometry(200, 450, 80, 30)
         self.cancelButton.clicked.connect(self.reject)
 
+        # Two columns of label-over-field pairs with the buttons underneath, placed by one layout.
+        left_column = QVBoxLayout()
+        for widget in (self.labelFont, self.defaultFontCombo, self.labelFontSize, self.defaultFontSizeSpin,
+                       self.labelCircleDiam, self.defaultCircleDiameterSpin,
+                       self.labelInnerRatio, self.defaultInnerRatioSpin, self.labelMargin, self.marginSpin,
+                       self.labelDashedThickness, self.dashedThicknessSpin,
+                       self.labelBluePen, self.blueCirclePenSpin):
+            left_column.addWidget(widget)
+        left_column.addStretch()
+        right_column = QVBoxLayout()
+        for widget in (self.defaultBoldCB, self.defaultItalicCB,
+                       self.labelLineThickness, self.defaultLineThicknessSpin,
+                       self.labelLetterStep, self.letterStepSpin, self.labelCircleStep, self.circleStepSpin):
+            right_column.addWidget(widget)
+        right_column.addStretch()
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        buttons.addWidget(self.okButton)
+        buttons.addWidget(self.cancelButton)
+        buttons.addStretch()
+        layout = QGridLayout(self)
+        layout.addLayout(left_column, 0, 0)
+        layout.addLayout(right_column, 0, 1)
+        layout.addLayout(buttons, 1, 0, 1, 2)
+
     def load_settings(self):
         self.defaultFontCombo.setCurrentFont(QFont(self.settings.value("defaultFont", "Arial")))
         self.defaultFontSizeSpin.setValue(int(self.settings.value("defaultFontSize", 40)))
@@ -248,31 +378,88 @@ class LaserNecklaceDesigner(QMainWindow):
         self.setGeometry(50, 50, 920, 750)
         QSettings.setDefaultFormat(QSettings.IniFormat)
         self.settings = QSettings("MyCompany", "LaserNecklaceDesigner")
-        self.letter_adjustment_step = 5.0
-        self.circle_adjustment_step = 5.0
+        self.read_settings()
         self.left_circle_offset_x = 0
         self.left_circle_offset_y = 0
         self.right_circle_offset_x = 0
         self.right_circle_offset_y = 0
-        self.margin_setting = 0.01
-        self.dashed_line_thickness = 1.0
         self.letter_items = []
         self.current_text = ""
         self.current_font_size = self.font_size_default()
         self.custom_positions = []  # Preserve custom positions.
-        self.undo_stack = []
-        self.redo_stack = []
-        self.save_path = self.settings.value("dxfSavePath", "")
+        # Held move buttons push a snapshot per repeat, so only the most recent ones are kept.
+        self._undo_limit = 100
+        self.undo_stack = deque(maxlen=self._undo_limit)
+        self.redo_stack = deque(maxlen=self._undo_limit)
         self.center_cross_item = None  # Will hold the center cross group.
+        self.center_cross_lines = None  # (horizontal, vertical) lines of that group.
+        self.union_item = None  # Outline of letters and circles, updated in place.
+        self.settings_dialog = None  # Built on first use; its font list is slow to fill.
+        self.selected_letters = []  # Kept in sync with the scene selection.
+        self.current_font_key = None
+        self._font_inputs = None  # (family, size, bold, italic) of the cached font and metrics
+        self._font = None
+        self._font_metrics = None
+        self._overlay_key = None  # Inputs of the last overlay build; equal inputs skip the rebuild.
+        # Circles are this unit circle scaled and moved into place.
+        # Outline builds running in OutlineBuilder threads; see start_outline_build.
+        self._outline_worker = None
+        self._outline_pending = None
+        self._letters_path_cache = None  # (letter scene paths, their combined path)
+        self._circle_cache = {}  # (x, y, radius) -> path
+        self._unit_circle = QPainterPath()
+        self._unit_circle.addEllipse(QPointF(0, 0), 1.0, 1.0)
         # New movable circle items.
         self.left_circle_item = None
         self.right_circle_item = None
-        self.blue_circle_pen_thickness = 0.1
+        self._glyph_cache = {}  # (font key, letter) -> (path, advance)
+        # Text, font and circle edits arrive in bursts; each burst is rebuilt once after it settles.
+        self._rebuild_timer = QTimer(self)
+        self._rebuild_timer.setSingleShot(True)
+        self._rebuild_timer.setInterval(40)
+        self._rebuild_timer.timeout.connect(self.rebuild_letters)
+        self._overlay_timer = QTimer(self)
+        self._overlay_timer.setSingleShot(True)
+        self._overlay_timer.setInterval(40)
+        self._overlay_timer.timeout.connect(self.update_union_overlay)
+        self._key_move_timer = QTimer(self)
+        self._key_move_timer.setSingleShot(True)
+        self._key_move_timer.setInterval(16)
+        self._key_move_timer.timeout.connect(self.update_union_overlay)
         self.init_ui()
         self.load_defaults()
 
+    @property
+    def undo_limit(self):
+        return self._undo_limit
+
+    @undo_limit.setter
+    def undo_limit(self, limit):
+        # A deque's maxlen is fixed, so the stacks are rebuilt; the newest snapshots are kept.
+        self._undo_limit = limit
+        self.undo_stack = deque(self.undo_stack, maxlen=limit)
+        self.redo_stack = deque(self.redo_stack, maxlen=limit)
+
     def font_size_default(self):
-        return int(self.settings.value("defaultFontSize", 40))
+        return self.default_font_size
+
+    def read_settings(self):
+        # Stored settings are read into attributes once, at startup and after the settings dialog,
+        # so nothing else touches the INI file.
+        value = self.settings.value
+        self.default_font_name = value("defaultFont", "Arial")
+        self.default_font_size = int(value("defaultFontSize", 40))
+        self.default_circle_diameter = int(value("defaultCircleDiameter", 60))
+        self.default_inner_ratio = int(value("defaultInnerRatio", 60))
+        self.default_bold = value("defaultBold", "false") == "true"
+        self.default_italic = value("defaultItalic", "false") == "true"
+        self.letter_adjustment_step = float(value("letterStep", 5.0))
+        self.circle_adjustment_step = float(value("circleStep", 5.0))
+        self.default_line_thickness = float(value("defaultLineThickness", 1.0))
+        self.margin_setting = float(value("margin", 0.01))
+        self.dashed_line_thickness = float(value("dashedThickness", 1.0))
+        self.save_path = value("dxfSavePath", "")
+        self.blue_circle_pen_thickness = float(value("blueCirclePenThickness", 0.1))
 
     def init_ui(self):
         self.central = QWidget(self)
@@ -284,7 +471,7 @@ class LaserNecklaceDesigner(QMainWindow):
         self.text_line_edit = QLineEdit(self.central)
         self.text_line_edit.setGeometry(70, 10, 300, 25)
         self.text_line_edit.setPlaceholderText("Yazı giriniz...")
-        self.text_line_edit.textChanged.connect(self.rebuild_letters)
+        self.text_line_edit.textChanged.connect(self.schedule_rebuild_letters)
         
         self.settings_button = QPushButton("Ayarlar", self.central)
         self.settings_button.setGeometry(380, 10, 80, 25)
@@ -294,7 +481,7 @@ class LaserNecklaceDesigner(QMainWindow):
         self.label_font.setGeometry(10, 45, 50, 25)
         self.font_combo = QFontComboBox(self.central)
         self.font_combo.setGeometry(70, 45, 200, 25)
-        self.font_combo.currentFontChanged.connect(self.rebuild_letters)
+        self.font_combo.currentFontChanged.connect(self.schedule_rebuild_letters)
         
         self.label_font_size = QLabel("Font Boyutu:", self.central)
         self.label_font_size.setGeometry(280, 45, 100, 25)
@@ -302,30 +489,30 @@ class LaserNecklaceDesigner(QMainWindow):
         self.font_size_spin.setRange(5, 100)
         self.font_size_spin.setGeometry(380, 45, 80, 25)
         self.font_size_spin.setValue(self.current_font_size)
-        self.font_size_spin.valueChanged.connect(self.rebuild_letters)
+        self.font_size_spin.valueChanged.connect(self.schedule_rebuild_letters)
         
         self.bold_checkbox = QCheckBox("Kalın", self.central)
         self.bold_checkbox.setGeometry(10, 80, 80, 25)
-        self.bold_checkbox.stateChanged.connect(self.rebuild_letters)
+        self.bold_checkbox.stateChanged.connect(self.schedule_rebuild_letters)
         self.italic_checkbox = QCheckBox("İtalik", self.central)
         self.italic_checkbox.setGeometry(100, 80, 80, 25)
-        self.italic_checkbox.stateChanged.connect(self.rebuild_letters)
+        self.italic_checkbox.stateChanged.connect(self.schedule_rebuild_letters)
         
         self.label_circle_diam = QLabel("Dış Yuvarlak Çapı:", self.central)
         self.label_circle_diam.setGeometry(10, 115, 150, 25)
         self.circle_diameter_spin = QSpinBox(self.central)
         self.circle_diameter_spin.setRange(1, 200)
         self.circle_diameter_spin.setGeometry(160, 115, 80, 25)
-        self.circle_diameter_spin.setValue(int(self.settings.value("defaultCircleDiameter", 60)))
-        self.circle_diameter_spin.valueChanged.connect(self.update_union_overlay)
+        self.circle_diameter_spin.setValue(self.default_circle_diameter)
+        self.circle_diameter_spin.valueChanged.connect(self.schedule_union_overlay)
         
         self.label_inner_ratio = QLabel("İç Yuvarlak (%) (Delik Oranı):", self.central)
         self.label_inner_ratio.setGeometry(250, 115, 200, 25)
         self.inner_ratio_spin = QSpinBox(self.central)
         self.inner_ratio_spin.setRange(10, 100)
         self.inner_ratio_spin.setGeometry(460, 115, 80, 25)
-        self.inner_ratio_spin.setValue(int(self.settings.value("defaultInnerRatio", 60)))
-        self.inner_ratio_spin.valueChanged.connect(self.update_union_overlay)
+        self.inner_ratio_spin.setValue(self.default_inner_ratio)
+        self.inner_ratio_spin.valueChanged.connect(self.schedule_union_overlay)
         
         # Checkbox for letter frame.
         self.frame_visibility_checkbox = QCheckBox("Harf Çerçevesi", self.central)
@@ -335,6 +522,10 @@ class LaserNecklaceDesigner(QMainWindow):
         
         # Graphics view.
         self.scene = QGraphicsScene()
+        # The scene holds a handful of items that move or are replaced on nearly every edit, so a
+        # BSP index costs more to keep up to date than the linear lookups it saves.
+        self.scene.setItemIndexMethod(QGraphicsScene.NoIndex)
+        self.scene.selectionChanged.connect(self.refresh_selected_letters)
         self.graphics_view = GraphicsView(self.scene, self.central)
         self.graphics_view.setGeometry(10, 150, 600, 400)
         
@@ -427,21 +618,25 @@ class LaserNecklaceDesigner(QMainWindow):
                 dx = -self.letter_adjustment_step
             elif event.key() == Qt.Key_D:
                 dx = self.letter_adjustment_step
-            # Check if any letter is selected.
-            letters_selected = any(isinstance(item, LetterItem) for item in self.scene.selectedItems())
-            for item in self.scene.selectedItems():
-                if isinstance(item, LetterItem):
-                    item.setPos(item.pos() + QPointF(dx, dy))
-                elif item is self.left_circle_item or item is self.right_circle_item:
-                    # If any letter is selected, don't update circle offsets; they follow union_overlay update.
-                    if not letters_selected:
-                        if item is self.left_circle_item:
-                            self.left_circle_offset_x += dx
-                            self.left_circle_offset_y += dy
-                        else:
-                            self.right_circle_offset_x += dx
-                            self.right_circle_offset_y += dy
-            self.update_union_overlay()
+            if self.selected_letters:
+                for item in self.selected_letters:
+                    item.moveBy(dx, dy)
+            else:
+                # Circle offsets only change when no letter is selected; otherwise the circles
+                # follow the letters through the overlay update.
+                if self.left_circle_item is not None and self.left_circle_item.isSelected():
+                    self.left_circle_offset_x += dx
+                    self.left_circle_offset_y += dy
+                if self.right_circle_item is not None and self.right_circle_item.isSelected():
+                    self.right_circle_offset_x += dx
+                    self.right_circle_offset_y += dy
+            # Items move right away. A tap updates the overlay on the timer; auto-repeats of a held
+            # key skip it and the overlay is rebuilt once when the key is released.
+            if event.isAutoRepeat():
+                self._key_move_timer.stop()
+            else:
+                self._key_move_timer.start()
+            event.accept()
         elif event.matches(QKeySequence.Undo):
             self.undo()
         elif event.matches(QKeySequence.Redo):
@@ -449,6 +644,16 @@ class LaserNecklaceDesigner(QMainWindow):
         else:
             super().keyPressEvent(event)
 
+    def keyReleaseEvent(self, event):
+        if event.key() in [Qt.Key_W, Qt.Key_A, Qt.Key_S, Qt.Key_D] and not event.isAutoRepeat():
+            self._key_move_timer.start()
+            event.accept()
+        else:
+            super().keyReleaseEvent(event)
+
+    def refresh_selected_letters(self):
+        self.selected_letters = [item for item in self.scene.selectedItems() if isinstance(item, LetterItem)]
+
     def toggle_frame_visibility(self, checked):
         LetterItem.show_frame = checked
         for item in self.letter_items:
@@ -464,20 +669,23 @@ class LaserNecklaceDesigner(QMainWindow):
             self.move_circle(False, dx, dy)
 
     def load_defaults(self):
-        default_font = QFont(self.settings.value("defaultFont", "Arial"))
+        default_font = QFont(self.default_font_name)
         self.font_combo.setCurrentFont(default_font)
-        self.font_size_spin.setValue(int(self.settings.value("defaultFontSize", 40)))
-        self.circle_diameter_spin.setValue(int(self.settings.value("defaultCircleDiameter", 60)))
-        self.inner_ratio_spin.setValue(int(self.settings.value("defaultInnerRatio", 60)))
-        self.bold_checkbox.setChecked(self.settings.value("defaultBold", "false") == "true")
-        self.italic_checkbox.setChecked(self.settings.value("defaultItalic", "false") == "true")
-        self.letter_adjustment_step = float(self.settings.value("letterStep", 5.0))
-        self.circle_adjustment_step = float(self.settings.value("circleStep", 5.0))
-        self.current_font_size = int(self.settings.value("defaultFontSize", 40))
-        self.default_line_thickness = float(self.settings.value("defaultLineThickness", 1.0))
-        self.margin_setting = float(self.settings.value("margin", 0.01))
-        self.dashed_line_thickness = float(self.settings.value("dashedThickness", 1.0))
-        LetterItem.line_thickness = self.dashed_line_thickness
+        self.font_size_spin.setValue(self.default_font_size)
+        self.circle_diameter_spin.setValue(self.default_circle_diameter)
+        self.inner_ratio_spin.setValue(self.default_inner_ratio)
+        self.bold_checkbox.setChecked(self.default_bold)
+        self.italic_checkbox.setChecked(self.default_italic)
+        self.current_font_size = self.default_font_size
+        LetterItem.set_line_thickness(self.dashed_line_thickness, self.letter_items)
+        self.union_pen = QPen(Qt.black, self.default_line_thickness)
+        self.circle_pen = QPen(Qt.blue, self.blue_circle_pen_thickness)
+        # Existing items only need their pens again when they are rebuilt here.
+        for circle_item in (self.left_circle_item, self.right_circle_item):
+            if circle_item is not None:
+                circle_item.setPen(self.circle_pen)
+        if self.union_item is not None:
+            self.union_item.setPen(self.union_pen)
         for btn in (self.arrow_up, self.arrow_down, self.arrow_left, self.arrow_right):
             btn.dx = (btn.dx/abs(btn.dx)) * self.letter_adjustment_step if btn.dx != 0 else 0
             btn.dy = (btn.dy/abs(btn.dy)) * self.letter_adjustment_step if btn.dy != 0 else 0
@@ -485,14 +693,19 @@ class LaserNecklaceDesigner(QMainWindow):
                     self.circle2_up, self.circle2_down, self.circle2_left, self.circle2_right):
             btn.dx = (btn.dx/abs(btn.dx)) * self.circle_adjustment_step if btn.dx != 0 else 0
             btn.dy = (btn.dy/abs(btn.dy)) * self.circle_adjustment_step if btn.dy != 0 else 0
-        self.save_path = self.settings.value("dxfSavePath", "")
         self.save_path_line_edit.setText(self.save_path)
-        self.blue_circle_pen_thickness = float(self.settings.value("blueCirclePenThickness", 0.1))
 
     def open_settings_dialog(self):
-        dialog = SettingsDialog(self.settings, self)
+        if self.settings_dialog is None:
+            self.settings_dialog = SettingsDialog(self.settings, self)
+        else:
+            # Reopened: show the stored values, not edits left from a cancelled session.
+            self.settings_dialog.load_settings()
+        dialog = self.settings_dialog
         if dialog.exec_() == QDialog.Accepted:
             dialog.save_settings()
+            self.settings.sync()
+            self.read_settings()
             self.load_defaults()
             self.rebuild_letters()
 
@@ -503,49 +716,74 @@ class LaserNecklaceDesigner(QMainWindow):
             self.save_path_line_edit.setText(path)
             self.settings.setValue("dxfSavePath", path)
 
+    def schedule_rebuild_letters(self):
+        self._rebuild_timer.start()
+
+    def schedule_union_overlay(self):
+        self._overlay_timer.start()
+
     def rebuild_letters(self):
         new_text = self.text_line_edit.text()
         new_font_size = self.font_size_spin.value()
-        font = self.font_combo.currentFont()
-        font.setPointSize(new_font_size)
-        font.setBold(self.bold_checkbox.isChecked())
-        font.setItalic(self.italic_checkbox.isChecked())
-        fm = QFontMetrics(font)
+        font_inputs = (self.font_combo.currentFont().family(), new_font_size,
+                       self.bold_checkbox.isChecked(), self.italic_checkbox.isChecked())
+        if font_inputs != self._font_inputs:
+            # The font and its metrics only change with these inputs, not with the text.
+            family, size, bold, italic = font_inputs
+            font = QFont(family)
+            font.setPointSize(size)
+            font.setBold(bold)
+            font.setItalic(italic)
+            self._font = font
+            self._font_metrics = QFontMetrics(font)
+            self._font_inputs = font_inputs
+            self.current_font_key = font.key()  # read by update_union_overlay below
+        font = self._font
+        fm = self._font_metrics
+        glyphs = [self.letter_glyph(font, fm, letter) for letter in new_text]
         # Center the full text on x-axis.
-        total_width = sum(fm.horizontalAdvance(letter) for letter in new_text)
+        total_width = sum(advance for _, advance in glyphs)
         x_cursor = -total_width / 2.0
         
         if new_text == self.current_text and len(self.letter_items) == len(new_text):
-            for idx, letter_item in enumerate(self.letter_items):
-                letter = new_text[idx]
-                path = QPainterPath()
-                path.addText(0, fm.ascent(), font, letter)
+            for letter_item, (path, advance) in zip(self.letter_items, glyphs):
                 letter_item.setPath(path)
                 letter_item.setPos(x_cursor, 0)
-                x_cursor += fm.horizontalAdvance(letter)
+                x_cursor += advance
             self.update_union_overlay()
         else:
             for item in self.letter_items:
                 self.scene.removeItem(item)
             self.letter_items = []
             self.custom_positions = []
-            for letter in new_text:
-                path = QPainterPath()
-                path.addText(0, fm.ascent(), font, letter)
+            for letter, (path, advance) in zip(new_text, glyphs):
                 letter_item = LetterItem(path, letter)
                 letter_item.setPos(x_cursor, 0)
                 self.scene.addItem(letter_item)
                 self.letter_items.append(letter_item)
                 self.custom_positions.append(QPointF(x_cursor, 0))
-                x_cursor += fm.horizontalAdvance(letter)
+                x_cursor += advance
             self.update_union_overlay()
         self.current_text = new_text
         self.current_font_size = new_font_size
 
+    def letter_glyph(self, font, fm, letter):
+        # addText is the slow part of rebuilding letters, so each (font, letter) outline and its
+        # advance are built once. QPainterPath is implicitly shared, so items can share one path.
+        key = (font.key(), letter)
+        glyph = self._glyph_cache.get(key)
+        if glyph is None:
+            if len(self._glyph_cache) >= 1024:
+                self._glyph_cache.clear()
+            path = QPainterPath()
+            path.addText(0, fm.ascent(), font, letter)
+            glyph = (path, fm.horizontalAdvance(letter))
+            self._glyph_cache[key] = glyph
+        return glyph
+
     def move_selected_letter(self, dx, dy):
-        for item in self.letter_items:
-            if item.isSelected():
-                item.setPos(item.pos() + QPointF(dx, dy))
+        for item in self.selected_letters:
+            item.moveBy(dx, dy)
         self.update_union_overlay()
 
     def move_circle(self, is_left, dx, dy):
@@ -557,20 +795,28 @@ class LaserNecklaceDesigner(QMainWindow):
             self.right_circle_offset_y += dy
         self.update_union_overlay()
 
+    def overlay_inputs(self):
+        # Everything the union outline, circles and center cross are built from.
+        letters = tuple((item.letter, item.pos().x(), item.pos().y()) for item in self.letter_items)
+        return (letters, self.current_font_key, self.margin_setting,
+                self.circle_diameter_spin.value(), self.inner_ratio_spin.value(),
+                self.left_circle_offset_x, self.left_circle_offset_y,
+                self.right_circle_offset_x, self.right_circle_offset_y,
+                self.default_line_thickness, self.blue_circle_pen_thickness,
+                self.center_cross_checkbox.isChecked())
+
     def update_union_overlay(self):
-        for item in self.scene.items():
-            if isinstance(item, QGraphicsPathItem) and item.data(1) == "union":
-                self.scene.removeItem(item)
+        key = self.overlay_inputs()
+        if key == self._overlay_key:
+            return
+        self._overlay_key = key
         if not self.letter_items:
+            self._outline_pending = None
+            if self.union_item is not None:
+                self.scene.removeItem(self.union_item)
+                self.union_item = None
             return
-        union_path = QPainterPath()
-        first = True
-        for letter_item in self.letter_items:
-            if first:
-                union_path = letter_item.mapToScene(letter_item.path())
-                first = False
-            else:
-                union_path = union_path.united(letter_item.mapToScene(letter_item.path()))
+        union_path = self.letters_scene_path()
         union_path.translate(self.margin_setting, self.margin_setting)
         bounds = union_path.boundingRect()
         circle_diam = self.circle_diameter_spin.value()
@@ -584,141 +830,175 @@ class LaserNecklaceDesigner(QMainWindow):
                                      default_left_center.y() + self.left_circle_offset_y)
         right_circle_center = QPointF(default_right_center.x() + self.right_circle_offset_x,
                                       default_right_center.y() + self.right_circle_offset_y)
-        left_outer = QPainterPath()
-        left_outer.addEllipse(left_circle_center, outer_radius, outer_radius)
-        right_outer = QPainterPath()
-        right_outer.addEllipse(right_circle_center, outer_radius, outer_radius)
-        left_inner = QPainterPath()
-        left_inner.addEllipse(left_circle_center, inner_radius, inner_radius)
-        right_inner = QPainterPath()
-        right_inner.addEllipse(right_circle_center, inner_radius, inner_radius)
-        combined = union_path.united(left_outer).united(right_outer)
-        combined = combined.subtracted(left_inner).subtracted(right_inner)
-        union_item = QGraphicsPathItem(combined)
-        pen = QPen(Qt.black, self.default_line_thickness)
-        union_item.setPen(pen)
-        union_item.setData(1, "union")
-        union_item.setZValue(1000)  # lower than circles
-        self.scene.addItem(union_item)
-        dims = combined.boundingRect()
-        self.dxf_dim_label.setText("DXF Boyutları: X = {:.2f}, Y = {:.2f}".format(dims.width(), dims.height()))
+        left_outer = self.circle_path(left_circle_center, outer_radius)
+        right_outer = self.circle_path(right_circle_center, outer_radius)
+        left_inner = self.circle_path(left_circle_center, inner_radius)
+        right_inner = self.circle_path(right_circle_center, inner_radius)
+        # The boolean ops are the slow part; they run in a worker and the outline is set when done.
+        self.start_outline_build((union_path, left_outer, right_outer, left_inner, right_inner))
         
         # Update or create movable circle items.
         if self.left_circle_item is None:
             self.left_circle_item = QGraphicsEllipseItem()
             self.left_circle_item.setFlag(QGraphicsEllipseItem.ItemIsSelectable, True)
             # Do not set ItemIsMovable so that mouse dragging is disabled.
-            self.left_circle_item.setPen(QPen(Qt.blue, self.blue_circle_pen_thickness))
+            self.left_circle_item.setPen(self.circle_pen)
             self.left_circle_item.setZValue(2000)
             self.scene.addItem(self.left_circle_item)
-        else:
-            self.left_circle_item.setPen(QPen(Qt.blue, self.blue_circle_pen_thickness))
         self.left_circle_item.setRect(left_circle_center.x()-outer_radius, left_circle_center.y()-outer_radius, outer_radius*2, outer_radius*2)
         
         if self.right_circle_item is None:
             self.right_circle_item = QGraphicsEllipseItem()
             self.right_circle_item.setFlag(QGraphicsEllipseItem.ItemIsSelectable, True)
             # Do not allow mouse move.
-            self.right_circle_item.setPen(QPen(Qt.blue, self.blue_circle_pen_thickness))
+            self.right_circle_item.setPen(self.circle_pen)
             self.right_circle_item.setZValue(2000)
             self.scene.addItem(self.right_circle_item)
-        else:
-            self.right_circle_item.setPen(QPen(Qt.blue, self.blue_circle_pen_thickness))
         self.right_circle_item.setRect(right_circle_center.x()-outer_radius, right_circle_center.y()-outer_radius, outer_radius*2, outer_radius*2)
         
         # Draw center cross if checkbox is checked.
         if self.center_cross_checkbox.isChecked():
-            self.draw_center_cross(union_path.boundingRect().center())
+            self.draw_center_cross(bounds.center())
         else:
             if self.center_cross_item is not None:
-                self.scene.removeItem(self.center_cross_item)
-                self.center_cross_item = None
+                self.center_cross_item.setVisible(False)
+
+    def start_outline_build(self, paths):
+        if self._outline_worker is not None:
+            # One build at a time; only the newest waiting request is kept.
+            self._outline_pending = paths
+            return
+        worker = OutlineBuilder(paths, self)
+        worker.built.connect(self.on_outline_built)
+        worker.finished.connect(self.on_outline_worker_finished)
+        worker.finished.connect(worker.deleteLater)
+        self._outline_worker = worker
+        worker.start()
+
+    def on_outline_built(self, combined):
+        if not self.letter_items:
+            return  # text was cleared while this was building
+        if self.union_item is None:
+            self.union_item = QGraphicsPathItem()
+            self.union_item.setData(1, "union")
+            self.union_item.setZValue(1000)  # lower than circles
+            self.union_item.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+            self.union_item.setPen(self.union_pen)
+            self.scene.addItem(self.union_item)
+        self.union_item.setPath(combined)
+        dims = combined.boundingRect()
+        self.dxf_dim_label.setText("DXF Boyutları: X = {:.2f}, Y = {:.2f}".format(dims.width(), dims.height()))
+
+    def on_outline_worker_finished(self):
+        self._outline_worker = None
+        if self._outline_pending is not None:
+            paths = self._outline_pending
+            self._outline_pending = None
+            self.start_outline_build(paths)
+
+    def closeEvent(self, event):
+        # A QThread destroyed while running aborts the process, so let the current build finish.
+        self._outline_pending = None
+        if self._outline_worker is not None:
+            self._outline_worker.wait()
+        super().closeEvent(event)
+
+    def circle_path(self, center, radius):
+        # Recently used circles are kept; callers only read or copy the returned path.
+        key = (center.x(), center.y(), radius)
+        path = self._circle_cache.get(key)
+        if path is None:
+            if len(self._circle_cache) >= 32:
+                self._circle_cache.clear()
+            transform = QTransform()
+            transform.translate(center.x(), center.y())
+            transform.scale(radius, radius)
+            path = transform.map(self._unit_circle)
+            self._circle_cache[key] = path
+        return path
+
+    def letters_scene_path(self):
+        # All letter outlines in scene coordinates, appended into one winding-filled path. Overlaps
+        # are resolved by the boolean ops against the circles, so no per-letter united() is needed.
+        # Reused while every letter still returns the same cached scene path, e.g. for DXF export
+        # right after an overlay update; callers get a copy because they translate it.
+        scene_paths = [letter_item.scene_path() for letter_item in self.letter_items]
+        cached = self._letters_path_cache
+        if (cached is not None and len(cached[0]) == len(scene_paths)
+                and all(a is b for a, b in zip(cached[0], scene_paths))):
+            return QPainterPath(cached[1])
+        path = QPainterPath()
+        path.setFillRule(Qt.WindingFill)
+        for scene_path in scene_paths:
+            path.addPath(scene_path)
+        self._letters_path_cache = (scene_paths, path)
+        return QPainterPath(path)
 
     def draw_center_cross(self, center):
-        if self.center_cross_item is not None:
-            self.scene.removeItem(self.center_cross_item)
-        hor_line = QGraphicsLineItem(center.x()-200, center.y(), center.x()+200, center.y())
-        ver_line = QGraphicsLineItem(center.x(), center.y()-200, center.x(), center.y()+200)
-        pen = QPen(Qt.red, 0.1, Qt.DashLine)
-        hor_line.setPen(pen)
-        ver_line.setPen(pen)
-        group = self.scene.createItemGroup([hor_line, ver_line])
-        self.center_cross_item = group
+        if self.center_cross_item is None:
+            hor_line = QGraphicsLineItem()
+            ver_line = QGraphicsLineItem()
+            pen = QPen(Qt.red, 0.1, Qt.DashLine)
+            hor_line.setPen(pen)
+            ver_line.setPen(pen)
+            self.center_cross_item = self.scene.createItemGroup([hor_line, ver_line])
+            self.center_cross_lines = (hor_line, ver_line)
+        hor_line, ver_line = self.center_cross_lines
+        hor_line.setLine(center.x()-200, center.y(), center.x()+200, center.y())
+        ver_line.setLine(center.x(), center.y()-200, center.x(), center.y()+200)
+        self.center_cross_item.setVisible(True)
 
     def zoom_in_selected_letters(self):
-        selected = [item for item in self.letter_items if item.isSelected()]
-        if len(selected) < 2:
-            return
-        self.push_undo_state()
-        selected.sort(key=lambda item: item.pos().x())
-        left = selected[0].pos().x()
-        right = selected[-1].pos().x()
-        current_gap = right - left
-        delta = self.letter_adjustment_step
-        new_gap = max(0, current_gap - 2 * delta)
-        center = (left + right) / 2.0
-        new_left = center - new_gap / 2.0
-        n = len(selected)
-        for i, item in enumerate(selected):
-            new_x = new_left + (new_gap * i / (n - 1)) if n > 1 else new_left
-            item.setPos(new_x, item.pos().y())
-        self.update_union_overlay()
+        self.spread_selected_letters(-self.letter_adjustment_step)
 
     def zoom_out_selected_letters(self):
-        selected = [item for item in self.letter_items if item.isSelected()]
+        self.spread_selected_letters(self.letter_adjustment_step)
+
+    def spread_selected_letters(self, delta):
+        # Spaces the selected letters evenly, widening the span by 2*delta around its center.
+        selected = list(self.selected_letters)
         if len(selected) < 2:
             return
         self.push_undo_state()
         selected.sort(key=lambda item: item.pos().x())
         left = selected[0].pos().x()
         right = selected[-1].pos().x()
-        current_gap = right - left
-        delta = self.letter_adjustment_step
-        new_gap = current_gap + 2 * delta
-        center = (left + right) / 2.0
-        new_left = center - new_gap / 2.0
-        n = len(selected)
+        new_gap = max(0, right - left + 2 * delta)
+        new_left = (left + right) / 2.0 - new_gap / 2.0
+        spacing = new_gap / (len(selected) - 1)
         for i, item in enumerate(selected):
-            new_x = new_left + (new_gap * i / (n - 1)) if n > 1 else new_left
-            item.setPos(new_x, item.pos().y())
+            item.setPos(new_left + spacing * i, item.pos().y())
+        self.update_union_overlay()
+
+    def letter_positions(self):
+        # Plain (x, y) floats; item.x()/y() avoid a QPointF wrapper per letter per snapshot.
+        return [(item.x(), item.y()) for item in self.letter_items]
+
+    def restore_letter_positions(self, state):
+        for item, (x, y) in zip(self.letter_items, state):
+            item.setPos(x, y)
         self.update_union_overlay()
 
     def push_undo_state(self):
-        state = [item.pos() for item in self.letter_items]
-        self.undo_stack.append(state)
+        self.undo_stack.append(self.letter_positions())
         self.redo_stack.clear()
 
     def undo(self):
         if not self.undo_stack:
             return
-        current_state = [item.pos() for item in self.letter_items]
-        self.redo_stack.append(current_state)
-        state = self.undo_stack.pop()
-        for item, pos in zip(self.letter_items, state):
-            item.setPos(pos)
-        self.update_union_overlay()
+        self.redo_stack.append(self.letter_positions())
+        self.restore_letter_positions(self.undo_stack.pop())
 
     def redo(self):
         if not self.redo_stack:
             return
-        current_state = [item.pos() for item in self.letter_items]
-        self.undo_stack.append(current_state)
-        state = self.redo_stack.pop()
-        for item, pos in zip(self.letter_items, state):
-            item.setPos(pos)
-        self.update_union_overlay()
+        self.undo_stack.append(self.letter_positions())
+        self.restore_letter_positions(self.redo_stack.pop())
 
     def export_to_dxf(self):
         if not self.letter_items:
             return
-        union_path = QPainterPath()
-        first = True
-        for letter_item in self.letter_items:
-            if first:
-                union_path = letter_item.mapToScene(letter_item.path())
-                first = False
-            else:
-                union_path = union_path.united(letter_item.mapToScene(letter_item.path()))
+        union_path = self.letters_scene_path()
         union_path.translate(self.margin_setting, self.margin_setting)
         br = union_path.boundingRect()
         sx = -1 if self.x_mirror_checkbox.isChecked() else 1
@@ -727,37 +1007,47 @@ class LaserNecklaceDesigner(QMainWindow):
         centerY = br.y() + br.height()/2
         dy = 0 if self.y_mirror_checkbox.isChecked() else 2*centerY
         transform = QTransform(sx, 0, 0, sy, dx, dy)
-        fixed_union = union_path * transform
+        # The boolean ops run on the untransformed letters; the mirror is applied to the exported
+        # points, so the letter path is never rebuilt in mirrored form.
+        inverse, _ = transform.inverted()
 
         circle_diam = self.circle_diameter_spin.value()
         outer_radius = circle_diam / 2.0
         inner_ratio = self.inner_ratio_spin.value() / 100.0
         inner_radius = outer_radius * inner_ratio
         overlap = 5
-        bounds = fixed_union.boundingRect()
+        # The mirror transform is axis-aligned, so mapping the rect gives the transformed path's bounds.
+        bounds = transform.mapRect(br)
         default_left_center = QPointF(bounds.left() + overlap, bounds.top() + bounds.height()/2)
         default_right_center = QPointF(bounds.right() - overlap, bounds.top() + bounds.height()/2)
         left_circle_center = QPointF(default_left_center.x() + self.left_circle_offset_x,
                                      default_left_center.y() + self.left_circle_offset_y)
         right_circle_center = QPointF(default_right_center.x() + self.right_circle_offset_x,
                                       default_right_center.y() + self.right_circle_offset_y)
-        left_outer = QPainterPath()
-        left_outer.addEllipse(left_circle_center, outer_radius, outer_radius)
-        right_outer = QPainterPath()
-        right_outer.addEllipse(right_circle_center, outer_radius, outer_radius)
-        left_inner = QPainterPath()
-        left_inner.addEllipse(left_circle_center, inner_radius, inner_radius)
-        right_inner = QPainterPath()
-        right_inner.addEllipse(right_circle_center, inner_radius, inner_radius)
-        combined = fixed_union.united(left_outer).united(right_outer)
-        combined = combined.subtracted(left_inner).subtracted(right_inner)
+        # Circles are placed relative to the mirrored bounds, then mapped back; a circle is its own mirror.
+        left_circle_center = inverse.map(left_circle_center)
+        right_circle_center = inverse.map(right_circle_center)
+        left_outer = self.circle_path(left_circle_center, outer_radius)
+        right_outer = self.circle_path(right_circle_center, outer_radius)
+        left_inner = self.circle_path(left_circle_center, inner_radius)
+        right_inner = self.circle_path(right_circle_center, inner_radius)
+        combined = combine_outline(union_path, left_outer, right_outer, left_inner, right_inner)
+        scale = np.array([sx, sy], dtype=np.float64)
+        offset = np.array([dx, dy], dtype=np.float64)
         polygons = combined.toSubpathPolygons()
         doc = ezdxf.new(dxfversion='R2010')
         msp = doc.modelspace()
         for poly in polygons:
-            points = [(pt.x(), pt.y()) for pt in poly]
-            if len(points) > 2:
-                msp.add_lwpolyline(points, close=True)
+            if poly.size() <= 2:
+                continue
+            # Collinear leftovers of the boolean ops have no area and cut nothing. The shoelace area
+            # also catches diagonal slivers, whose bounding rect is not empty.
+            points = polygon_points(poly)
+            x, y = points[:, 0], points[:, 1]
+            if abs(np.dot(x, np.roll(y, 1)) - np.dot(y, np.roll(x, 1))) / 2 <= 1e-12:
+                continue
+            points = points * scale + offset
+            msp.add_lwpolyline(points.tolist(), close=True)
         filename = self.save_path if self.save_path else "laser_necklace_design.dxf"
         doc.saveas(filename)
         self.status_label.setText(f"{filename} kaydedildi.")
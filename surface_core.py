@@ -0,0 +1,571 @@
+# Height-map, G-code and STL surface helpers used by combine1.py. Nothing here imports Qt or VTK,
+# so it runs with NumPy alone (Numba and SciPy are optional speed-ups).
+import mmap
+import re
+import numpy as np
+
+# Numba kernels below are declared with explicit signatures and cache=True: they are compiled
+# once when the module is first imported and later launches load the machine code from the
+# on-disk cache (__pycache__, or Numba's per-user cache dir if that is not writable).
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:  # Numba is optional; fall back to plain Python kernels.
+    NUMBA_AVAILABLE = False
+    def njit(*args, **kwargs):
+        return lambda func: func
+    prange = range
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # SciPy is optional; nearest-centroid lookups fall back to a linear scan.
+    cKDTree = None
+
+# Axis word and its numeric value, e.g. "X-12.5" -> ("X", "-12.5").
+_AXIS_RE = re.compile(r'([XYZIJ])([-+]?\d*\.?\d+)')
+# Section header line in height-map data files ("--- Bölüm ..."), matched on the raw bytes
+# so both UTF-8 and Windows-1254 encoded files are recognised.
+_SECTION_RE = re.compile(rb'^[ \t]*--- B(?:\xc3\xb6|\xf6)l(?:\xc3\xbc|\xfc)m[^\n]*$', re.M)
+# Whitespace-delimited G-code word, e.g. "F1200" -> ("F", "1200"); trailing-dot ("X10.") and
+# exponent ("X1e-3") values are accepted like float() does.
+_TOKEN_RE = re.compile(r'(?<!\S)([XYZFIJS])([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)(?!\S)')
+# Motion-command prefixes: G0-G2 lines counted in G-code stats, G0/G1 lines rewritten by the offsets.
+_G012_RE = re.compile(r'[Gg][012]')
+_G0_G1_RE = re.compile(r'^(G0|G1)\S*')
+# A G1 line exactly as written by the interpolated-move templates in combine1.py: X and Y values,
+# then the Z/F tail (which holds the Z value as group 4).
+_G1_MOVE_LINE_RE = re.compile(r'G1 X(-?\d+\.\d{4}) Y(-?\d+\.\d{4})( Z(-?\d+\.\d{4})(?: F-?\d+\.\d)?\n)')
+# Word templates used by generate_gcode_line, in output order.
+_GCODE_WORD_FORMATS = (("X", " X%.4f"), ("Y", " Y%.4f"), ("Z", " Z%.4f"), ("F", " F%.1f"), ("S", " S%d"))
+
+# ----------------------- Height Maps -----------------------
+# No fastmath here: height maps are NaN-padded and fastmath lets LLVM assume there are no NaNs.
+@njit("float32[:, ::1](float32[:, ::1], float64, int64)", cache=True, boundscheck=False)
+def _smooth_height_map_kernel(height_map, threshold, max_iterations):
+    # Compiled with Numba so the in-place, cell-by-cell update order is kept exactly
+    # (Gauss-Seidel); each cell sees the values already written by its left/upper neighbours.
+    y_count = height_map.shape[0]
+    x_count = height_map.shape[1]
+    for _ in range(max_iterations):
+        adjusted = False
+        for j in range(y_count):
+            for i in range(x_count):
+                if i < x_count - 1:
+                    diff = height_map[j, i+1] - height_map[j, i]
+                    if abs(diff) > threshold:
+                        mean_val = (height_map[j, i+1] + height_map[j, i]) / 2.0
+                        height_map[j, i] = mean_val
+                        height_map[j, i+1] = mean_val
+                        adjusted = True
+                if j < y_count - 1:
+                    diff = height_map[j+1, i] - height_map[j, i]
+                    if abs(diff) > threshold:
+                        mean_val = (height_map[j+1, i] + height_map[j, i]) / 2.0
+                        height_map[j, i] = mean_val
+                        height_map[j+1, i] = mean_val
+                        adjusted = True
+        if not adjusted:
+            break
+    return height_map
+
+def _smooth_height_map_vectorized(height_map, threshold, max_iterations):
+    # Same pairwise averaging done with whole-array slices. Pairs along an axis are judged
+    # from the values at the start of that sweep (Jacobi-style), so results can differ
+    # slightly from the sequential kernel.
+    for _ in range(max_iterations):
+        left, right = height_map[:, :-1], height_map[:, 1:]
+        mask_x = np.abs(right - left) > threshold
+        mean_x = (left + right) * 0.5
+        left[mask_x] = mean_x[mask_x]
+        right[mask_x] = mean_x[mask_x]
+        top, bottom = height_map[:-1, :], height_map[1:, :]
+        mask_y = np.abs(bottom - top) > threshold
+        mean_y = (top + bottom) * 0.5
+        top[mask_y] = mean_y[mask_y]
+        bottom[mask_y] = mean_y[mask_y]
+        if not (mask_x.any() or mask_y.any()):
+            break
+    return height_map
+
+def smooth_height_map(height_map, threshold=0.5, max_iterations=10):
+    height_map = np.ascontiguousarray(height_map, dtype=np.float32)
+    if NUMBA_AVAILABLE:
+        return _smooth_height_map_kernel(height_map, float(threshold), int(max_iterations))
+    # Without Numba the sequential kernel would run in the interpreter; use the slice-based pass.
+    return _smooth_height_map_vectorized(height_map, threshold, max_iterations)
+
+@njit("Tuple((float32[:, ::1], int64[:, ::1]))(float32[:, ::1], float64, float64)", cache=True)
+def _height_map_mesh_kernel(height_map, x_step, y_step):
+    # Single pass over the grid: valid cells become vertices (row-major), then every quad with
+    # four valid corners becomes two triangles indexing those vertices.
+    y_count = height_map.shape[0]
+    x_count = height_map.shape[1]
+    vertex_index = np.full((y_count, x_count), -1, dtype=np.int64)
+    vertices = np.empty((y_count * x_count, 3), dtype=np.float32)
+    n = 0
+    for j in range(y_count):
+        for i in range(x_count):
+            z = height_map[j, i]
+            if not np.isnan(z):
+                vertex_index[j, i] = n
+                vertices[n, 0] = np.float32(i) * np.float32(x_step)
+                vertices[n, 1] = np.float32(j) * np.float32(y_step)
+                vertices[n, 2] = z
+                n += 1
+    faces = np.empty((2 * max(y_count - 1, 0) * max(x_count - 1, 0), 3), dtype=np.int64)
+    m = 0
+    for j in range(y_count - 1):
+        for i in range(x_count - 1):
+            v0 = vertex_index[j, i]
+            v1 = vertex_index[j, i + 1]
+            v2 = vertex_index[j + 1, i]
+            v3 = vertex_index[j + 1, i + 1]
+            if v0 >= 0 and v1 >= 0 and v2 >= 0 and v3 >= 0:
+                faces[m, 0] = v0
+                faces[m, 1] = v1
+                faces[m, 2] = v2
+                faces[m + 1, 0] = v2
+                faces[m + 1, 1] = v1
+                faces[m + 1, 2] = v3
+                m += 2
+    return vertices[:n].copy(), faces[:m].copy()
+
+def _height_map_mesh_vectorized(height_map, x_step, y_step):
+    # Same vertices and faces built with whole-array masks and index arithmetic.
+    y_count, x_count = height_map.shape
+    x_coords = np.arange(x_count, dtype=np.float32) * x_step
+    y_coords = np.arange(y_count, dtype=np.float32) * y_step
+    xx, yy = np.meshgrid(x_coords, y_coords)
+    valid = ~np.isnan(height_map)
+    vertices = np.column_stack([xx[valid], yy[valid], height_map[valid]])
+    # Grid index of the top-left corner of every quad; a quad is kept only if all four corners are valid.
+    v0 = np.add.outer(np.arange(y_count - 1) * x_count, np.arange(x_count - 1))
+    v1 = v0 + 1
+    v2 = v0 + x_count
+    v3 = v2 + 1
+    quad_mask = valid[:-1, :-1] & valid[:-1, 1:] & valid[1:, :-1] & valid[1:, 1:]
+    faces = np.stack([np.stack([v0, v1, v2], axis=-1)[quad_mask],
+                      np.stack([v2, v1, v3], axis=-1)[quad_mask]], axis=1).reshape(-1, 3)
+    # vertices only holds the valid cells, so map grid indices to their row in it.
+    faces = (np.cumsum(valid.ravel()) - 1)[faces]
+    return vertices, faces
+
+def build_height_map_mesh(height_map, x_step, y_step):
+    # Returns (vertices, faces) for the height-map surface, with the vertices centred on their mean.
+    height_map = np.ascontiguousarray(height_map, dtype=np.float32)
+    if NUMBA_AVAILABLE:
+        vertices, faces = _height_map_mesh_kernel(height_map, float(x_step), float(y_step))
+    else:
+        vertices, faces = _height_map_mesh_vectorized(height_map, x_step, y_step)
+    center = np.mean(vertices, axis=0)
+    vertices -= center
+    return vertices, faces
+
+def _parse_height_map_section(block):
+    try:
+        return np.array(block.split(), dtype=np.float64)
+    except ValueError:
+        # Fall back to skipping lines that are not plain numbers.
+        values = []
+        for line in block.splitlines():
+            try:
+                values.append(float(line))
+            except ValueError:
+                continue
+        return np.array(values, dtype=np.float64)
+
+def parse_height_map_file(file_path):
+    # The file is scanned through a read-only memory map instead of being decoded into one string.
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+        # Anything before the first section header is ignored.
+        blocks = _SECTION_RE.split(content)[1:]
+    sections = [_parse_height_map_section(block) for block in blocks]
+    lengths = np.fromiter((section.size for section in sections), dtype=np.intp, count=len(sections))
+    # float32 is ample for probe heights and halves the memory the smoothing and meshing passes touch.
+    height_map = np.full((len(sections), lengths.max()), np.nan, dtype=np.float32)
+    # Row-major boolean assignment fills each row's leading cells in order.
+    height_map[np.arange(height_map.shape[1]) < lengths[:, None]] = np.concatenate(sections)
+    return height_map
+
+def parse_gcode(file_path):
+    # Only motion lines are kept while streaming through the file.
+    with open(file_path, 'r') as file:
+        moves = [line for line in map(str.strip, file) if line[:2] in ('G0', 'G1', 'G2', 'G3')]
+    num_steps = 20
+    # A straight move adds one row and an arc at most num_steps, so the buffer is sized up front
+    # and filled through a write cursor.
+    arc_count = sum(1 for line in moves if line[:2] in ('G2', 'G3'))
+    coordinates = np.empty((len(moves) + (num_steps - 1) * arc_count, 3))
+    n = 0
+    x, y, z = 0.0, 0.0, 0.2
+    for line in moves:
+        command = line[:2]
+        gcode_parts = {axis: float(value) for axis, value in _AXIS_RE.findall(line)}
+        if command in ('G0', 'G1'):
+            x = gcode_parts.get('X', x)
+            y = gcode_parts.get('Y', y)
+            z = gcode_parts.get('Z', z)
+        else:
+            i = gcode_parts.get('I', None)
+            j = gcode_parts.get('J', None)
+            end_x = gcode_parts.get('X', x)
+            end_y = gcode_parts.get('Y', y)
+            if i is not None and j is not None:
+                center_x = x + i
+                center_y = y + j
+                radius = np.sqrt(i**2 + j**2)
+                direction = 'clockwise' if command == 'G2' else 'counterclockwise'
+                start_angle = np.arctan2(y - center_y, x - center_x)
+                end_angle = np.arctan2(end_y - center_y, end_x - center_x)
+                if direction == 'clockwise':
+                    if end_angle < start_angle:
+                        end_angle += 2 * np.pi
+                else:
+                    if end_angle > start_angle:
+                        end_angle -= 2 * np.pi
+                angles = np.linspace(start_angle, end_angle, num_steps)
+                arc_rows = coordinates[n:n + num_steps]
+                arc_rows[:, 0] = center_x + radius * np.cos(angles)
+                arc_rows[:, 1] = center_y + radius * np.sin(angles)
+                arc_rows[:, 2] = z
+                n += num_steps
+                x, y = arc_rows[-1, 0], arc_rows[-1, 1]
+                continue
+            x, y = end_x, end_y
+        coordinates[n] = x, y, z
+        n += 1
+    return coordinates[:n]
+
+def remove_consecutive_duplicates_gcode(lines):
+    if not lines:
+        return lines
+    filtered = [lines[0]]
+    for line in lines[1:]:
+        if line.strip() != filtered[-1].strip():
+            filtered.append(line)
+    return filtered
+
+# Move interpolation: each takes M moves and returns an (M, steps + 1, 3) array of X, Y, Z rows.
+# The Numba kernels fill a preallocated buffer with an explicit prange loop over the moves (Numba's
+# parallel backend rejects the broadcast expressions the NumPy versions use); without Numba the
+# whole-array NumPy versions are used instead.
+@njit("float64[:, :, ::1](float64[:, ::1], float64[:, ::1], int64)", parallel=True, cache=True)
+def _interpolate_segments_kernel(starts, ends, steps):
+    points = np.empty((starts.shape[0], steps + 1, 3))
+    for m in prange(starts.shape[0]):
+        for i in range(steps + 1):
+            factor = i / steps
+            for k in range(3):
+                points[m, i, k] = starts[m, k] + (ends[m, k] - starts[m, k]) * factor
+    return points
+
+def _interpolate_segments_vectorized(starts, ends, steps):
+    factor = np.arange(steps + 1) / float(steps)
+    return starts[:, None, :] + factor[None, :, None] * (ends - starts)[:, None, :]
+
+@njit("float64[:, :, ::1](float64[:, ::1], float64[:, ::1], float64[:, ::1], int64)", parallel=True, cache=True)
+def _interpolate_arcs_kernel(starts, ends, offsets, steps):
+    points = np.empty((starts.shape[0], steps + 1, 3))
+    for m in prange(starts.shape[0]):
+        center_x = starts[m, 0] + offsets[m, 0]
+        center_y = starts[m, 1] + offsets[m, 1]
+        radius = np.sqrt(offsets[m, 0]**2 + offsets[m, 1]**2)
+        start_angle = np.arctan2(starts[m, 1] - center_y, starts[m, 0] - center_x)
+        end_angle = np.arctan2(ends[m, 1] - center_y, ends[m, 0] - center_x)
+        if end_angle > start_angle:
+            end_angle -= 2 * np.pi
+        for i in range(steps + 1):
+            factor = i / steps
+            theta = start_angle + (end_angle - start_angle) * factor
+            points[m, i, 0] = center_x + radius * np.cos(theta)
+            points[m, i, 1] = center_y + radius * np.sin(theta)
+            points[m, i, 2] = starts[m, 2] + (ends[m, 2] - starts[m, 2]) * factor
+    return points
+
+def _interpolate_arcs_vectorized(starts, ends, offsets, steps):
+    center_x = starts[:, 0] + offsets[:, 0]
+    center_y = starts[:, 1] + offsets[:, 1]
+    radius = np.sqrt(offsets[:, 0]**2 + offsets[:, 1]**2)
+    start_angle = np.arctan2(starts[:, 1] - center_y, starts[:, 0] - center_x)
+    end_angle = np.arctan2(ends[:, 1] - center_y, ends[:, 0] - center_x)
+    end_angle = np.where(end_angle > start_angle, end_angle - 2 * np.pi, end_angle)
+    factor = np.arange(steps + 1) / float(steps)
+    theta = start_angle[:, None] + (end_angle - start_angle)[:, None] * factor[None, :]
+    points = np.empty((starts.shape[0], steps + 1, 3))
+    points[:, :, 0] = center_x[:, None] + radius[:, None] * np.cos(theta)
+    points[:, :, 1] = center_y[:, None] + radius[:, None] * np.sin(theta)
+    points[:, :, 2] = starts[:, 2][:, None] + (ends[:, 2] - starts[:, 2])[:, None] * factor[None, :]
+    return points
+
+# ----------------------- G-Code Moves -----------------------
+def parse_coordinates(line):
+    return {axis: float(value) for axis, value in _TOKEN_RE.findall(line)}
+
+def generate_gcode_line(coords, command="G1"):
+    # Rebuild the line preserving additional tokens (like S for spindle speed)
+    parts = [command]
+    for axis, template in _GCODE_WORD_FORMATS:
+        value = coords.get(axis)
+        if value is not None:
+            parts.append(template % value)
+    parts.append("\n")
+    return "".join(parts)
+
+def interpolate_segments(segments, steps=10):
+    # segments: list of (start, end) coordinate dicts.
+    if steps < 1:
+        raise ValueError(f"steps must be at least 1, got {steps}")
+    starts = np.array([(start["X"], start["Y"], start["Z"]) for start, _ in segments], dtype=np.float64)
+    ends = np.array([(end["X"], end["Y"], end["Z"]) for _, end in segments], dtype=np.float64)
+    if NUMBA_AVAILABLE:
+        return _interpolate_segments_kernel(starts.reshape(-1, 3), ends.reshape(-1, 3), int(steps))
+    return _interpolate_segments_vectorized(starts.reshape(-1, 3), ends.reshape(-1, 3), int(steps))
+
+def interpolate_arcs(arcs, steps=10):
+    # arcs: list of (start, end, I, J); a missing I or J counts as 0.
+    if steps < 1:
+        raise ValueError(f"steps must be at least 1, got {steps}")
+    starts = np.array([(start["X"], start["Y"], start["Z"]) for start, _, _, _ in arcs], dtype=np.float64)
+    ends = np.array([(end["X"], end["Y"], end["Z"]) for _, end, _, _ in arcs], dtype=np.float64)
+    offsets = np.array([(I if I is not None else 0, J if J is not None else 0) for _, _, I, J in arcs],
+                       dtype=np.float64)
+    if NUMBA_AVAILABLE:
+        return _interpolate_arcs_kernel(starts.reshape(-1, 3), ends.reshape(-1, 3), offsets.reshape(-1, 2), int(steps))
+    return _interpolate_arcs_vectorized(starts.reshape(-1, 3), ends.reshape(-1, 3), offsets.reshape(-1, 2), int(steps))
+
+def compute_gcode_stats(lines):
+    # One X/Y/Z row per move line, NaN where a word is missing; converted and reduced with
+    # NumPy once at the end. Interpolated moves keep their values as text until then.
+    rows, move_rows = [], []
+    nan = np.nan
+    # Pattern methods bound once; saves two attribute lookups per line.
+    match_move_line, is_move = _G1_MOVE_LINE_RE.fullmatch, _G012_RE.match
+    for line in lines:
+        match = match_move_line(line)
+        if match:
+            move_rows.append(match.group(1, 2, 4))
+        elif is_move(line):
+            coords = parse_coordinates(line)
+            rows.append((coords.get("X", nan), coords.get("Y", nan), coords.get("Z", nan)))
+    xyz = np.concatenate([np.array(move_rows, dtype=np.float64).reshape(-1, 3),
+                          np.array(rows, dtype=np.float64).reshape(-1, 3)])
+    if len(xyz) and not np.isnan(xyz).all(axis=0).any():
+        (min_x, min_y, min_z), (max_x, max_y, max_z) = np.nanmin(xyz, axis=0), np.nanmax(xyz, axis=0)
+        dim_str = f"X: [{min_x:.4f}, {max_x:.4f}]  Y: [{min_y:.4f}, {max_y:.4f}]  Z: [{min_z:.4f}, {max_z:.4f}]"
+    else:
+        dim_str = "Bilinmiyor"
+    return dim_str, len(lines)
+
+def parse_xy_moves(lines):
+    # One parsing pass shared by shift_gcode_xy and gcode_xy_bounds. Interpolated moves
+    # written by GCodeEditorWidget.format_moves are handled in bulk: their X/Y values become one array and the
+    # Z/F tail is kept as text. Every other G0/G1 line is kept as (index, command, coords).
+    move_indices, move_xy, move_tails, others = [], [], [], []
+    # Pattern methods bound once; saves two attribute lookups per line.
+    match_move_line, is_g0_g1 = _G1_MOVE_LINE_RE.fullmatch, _G0_G1_RE.match
+    for index, line in enumerate(lines):
+        match = match_move_line(line)
+        if match:
+            move_indices.append(index)
+            move_xy.append(match.group(1, 2))
+            move_tails.append(match.group(3))
+        else:
+            command = is_g0_g1(line)
+            if command:
+                # The whole command word (same as line.split()[0]), so e.g. "G01" is kept.
+                others.append((index, command.group(0), parse_coordinates(line)))
+    move_xy = np.array(move_xy, dtype=np.float64).reshape(-1, 2)
+    return move_indices, move_xy, move_tails, others
+
+def shift_gcode_xy(lines, off_x, off_y, parsed=None):
+    move_indices, move_xy, move_tails, others = parsed if parsed is not None else parse_xy_moves(lines)
+    new_lines = list(lines)
+    for index, command, coords in others:
+        shifted = dict(coords)
+        if shifted.get("X") is not None:
+            shifted["X"] += off_x
+        if shifted.get("Y") is not None:
+            shifted["Y"] += off_y
+        new_lines[index] = generate_gcode_line(shifted, command=command)
+    xy = move_xy + (off_x, off_y)
+    for index, (x, y), tail in zip(move_indices, xy.tolist(), move_tails):
+        new_lines[index] = "G1 X%.4f Y%.4f%s" % (x, y, tail)
+    return new_lines
+
+def gcode_xy_bounds(lines, parsed=None):
+    # (min_x, max_x, min_y, max_y) over the X/Y words of all G0/G1 lines, or None if either
+    # axis never appears.
+    _, move_xy, _, others = parsed if parsed is not None else parse_xy_moves(lines)
+    xs = np.concatenate([move_xy[:, 0], [c["X"] for _, _, c in others if c.get("X") is not None]])
+    ys = np.concatenate([move_xy[:, 1], [c["Y"] for _, _, c in others if c.get("Y") is not None]])
+    if not xs.size or not ys.size:
+        return None
+    return xs.min(), xs.max(), ys.min(), ys.max()
+
+# Anchor of each center choice as (x, y) indices into (min, middle, max) of the G-code bounds.
+CENTER_ANCHORS = {
+    "Top-Left": (0, 2), "Top-Center": (1, 2), "Top-Right": (2, 2),
+    "Middle-Left": (0, 1), "Center": (1, 1), "Middle-Right": (2, 1),
+    "Bottom-Left": (0, 0), "Bottom-Center": (1, 0), "Bottom-Right": (2, 0),
+}
+
+def center_offset(bounds, center_choice):
+    # XY shift that moves the centre of bounds onto the anchor point picked by center_choice.
+    min_x, max_x, min_y, max_y = bounds
+    xs = (min_x, (min_x + max_x) / 2, max_x)
+    ys = (min_y, (min_y + max_y) / 2, max_y)
+    ix, iy = CENTER_ANCHORS.get(center_choice, (1, 1))
+    return xs[ix] - xs[1], ys[iy] - ys[1]
+
+# ----------------------- STL Surface Heights -----------------------
+# Height of an STL surface under XY query points. Triangle centroids (and a KD-tree over their XY)
+# are computed once per mesh instead of on every Z query.
+class StlHeightLookup:
+    def __init__(self, stl_mesh):
+        self.mesh = stl_mesh
+        all_points = stl_mesh.vectors.reshape(-1, 3)
+        self.bounds = np.array([all_points.min(axis=0), all_points.max(axis=0)])
+        centroids = np.mean(stl_mesh.vectors, axis=1, dtype=np.float32)
+        self._centroids_xy = np.ascontiguousarray(centroids[:, :2])
+        self._centroids_z = centroids[:, 2].copy()
+        self._kdtree = cKDTree(self._centroids_xy) if cKDTree is not None else None
+        self._surface_ring = None
+        self.build_centroid_buckets()
+
+    def heights(self, xy):
+        # xy: (N, 2) query points in mesh coordinates; returns the surface height under each.
+        z_heights = self.surface_heights(xy)
+        # Points off the surface fall back to the nearest triangle centroid's Z.
+        missing = np.isnan(z_heights)
+        if missing.any():
+            z_heights[missing] = self._centroids_z[self.nearest_centroid_indices(xy[missing])]
+        return z_heights
+
+    def build_centroid_buckets(self):
+        # Uniform XY grid over the centroids, sized for about two centroids per cell. Each cell
+        # lists its triangle indices, padded with len(centroids), which points at a sentinel
+        # centroid at infinity (and a NaN sentinel triangle).
+        self._buckets = None
+        centroids_xy = self._centroids_xy
+        n = len(centroids_xy)
+        origin = centroids_xy.min(axis=0).astype(np.float64)
+        extent = centroids_xy.max(axis=0) - origin
+        if n < 2 or extent.min() <= 0:
+            return
+        # A triangle containing a point has its centroid within reach of it. Cells are made at
+        # least reach / 3 wide, so at most 4 rings of cells around the point hold every such triangle.
+        vectors = self.mesh.vectors
+        reach = float(np.sqrt(np.max(np.sum((vectors[:, :, :2] - centroids_xy[:, None, :])**2, axis=2))))
+        cell = max(float(np.sqrt(extent[0] * extent[1] * 2.0 / n)), reach / 3.0)
+        nx, ny = (extent // cell).astype(np.intp) + 1
+        ix, iy = ((centroids_xy - origin) // cell).astype(np.intp).T
+        cell_ids = iy * nx + ix
+        counts = np.bincount(cell_ids, minlength=nx * ny)
+        if counts.max() > 32:
+            # Strongly clustered meshes are left to the KD-tree / brute-force search.
+            return
+        ring = int(reach // cell) + 1
+        self._surface_ring = ring
+        # Queries up to ring cells outside the grid are searched ring cells further out still.
+        pad = 2 * ring
+        order = np.argsort(cell_ids, kind="stable")
+        starts = np.cumsum(counts) - counts
+        slots = np.arange(n) - starts[cell_ids[order]]
+        buckets = np.full((ny + 2 * pad, nx + 2 * pad, counts.max()), n, dtype=np.intp)
+        buckets[iy[order] + pad, ix[order] + pad, slots] = order
+        self._buckets = buckets
+        self._bucket_pad = pad
+        self._bucket_origin = origin
+        self._bucket_size = cell
+        self._centroids_xy_padded = np.vstack([centroids_xy, np.full((1, 2), np.inf, dtype=centroids_xy.dtype)])
+        self._triangles_padded = np.concatenate([vectors, np.full((1, 3, 3), np.nan, dtype=vectors.dtype)])
+
+    def bucket_candidates(self, xy, ring):
+        # Triangle indices from the cells within ring of each query's cell, lowest index first,
+        # and a mask of queries whose cell lies within ring cells of the grid (no centroid
+        # further out can be in reach of them).
+        buckets = self._buckets
+        pad = self._bucket_pad
+        ny, nx = buckets.shape[0] - 2 * pad, buckets.shape[1] - 2 * pad
+        cells = np.floor((xy - self._bucket_origin) / self._bucket_size)
+        inside = ((cells[:, 0] >= -ring) & (cells[:, 0] <= nx - 1 + ring) &
+                  (cells[:, 1] >= -ring) & (cells[:, 1] <= ny - 1 + ring))
+        ix = np.where(inside, cells[:, 0], 0).astype(np.intp) + pad
+        iy = np.where(inside, cells[:, 1], 0).astype(np.intp) + pad
+        offsets = range(-ring, ring + 1)
+        candidates = np.concatenate([buckets[iy + dy, ix + dx] for dy in offsets for dx in offsets], axis=1)
+        candidates.sort(axis=1)
+        return candidates, inside
+
+    def bucket_nearest_indices(self, xy):
+        # Nearest centroid among the 3x3 cells around each query, or -1 where a closer centroid
+        # could lie outside that block (query away from the grid, or no hit within one cell).
+        cell = self._bucket_size
+        candidates, inside = self.bucket_candidates(xy, 1)
+        distances = np.sum((self._centroids_xy_padded[candidates] - xy[:, None, :])**2, axis=2)
+        # Candidates are sorted, so ties resolve the same way as np.argmin over all centroids.
+        best = np.argmin(distances, axis=1)
+        rows = np.arange(len(xy))
+        # Every centroid outside the block is at least one cell away from the query.
+        resolved = inside & (distances[rows, best] < (0.999 * cell)**2)
+        return np.where(resolved, candidates[rows, best], -1)
+
+    def surface_heights(self, xy):
+        # Height of the STL surface under each query, interpolated linearly inside the triangle
+        # that contains it (the highest one where several overlap); NaN where none does.
+        heights = np.full(len(xy), np.nan)
+        if self._buckets is None:
+            # No bucket grid (tiny or strongly clustered mesh): test every triangle, in blocks so
+            # the candidate arrays stay around 2M entries.
+            triangles = self.mesh.vectors[None]
+            block = max(1, 2_000_000 // max(1, triangles.shape[1]))
+            for start in range(0, len(xy), block):
+                query = xy[start:start + block]
+                heights[start:start + block] = self.containing_heights(query, triangles)
+            return heights
+        block = max(1, 2_000_000 // ((2 * self._surface_ring + 1)**2 * self._buckets.shape[2]))
+        for start in range(0, len(xy), block):
+            query = xy[start:start + block]
+            candidates, inside = self.bucket_candidates(query, self._surface_ring)
+            z = self.containing_heights(query, self._triangles_padded[candidates])
+            heights[start:start + block] = np.where(inside, z, np.nan)
+        return heights
+
+    def containing_heights(self, query, tri):
+        # tri: (len(query) or 1, k, 3, 3) candidate triangles per query. Returns the highest
+        # barycentric Z among the candidates containing each query, NaN where none does.
+        ax, ay, az = tri[..., 0, 0], tri[..., 0, 1], tri[..., 0, 2]
+        bx, by, bz = tri[..., 1, 0], tri[..., 1, 1], tri[..., 1, 2]
+        cx, cy, cz = tri[..., 2, 0], tri[..., 2, 1], tri[..., 2, 2]
+        px, py = query[:, 0, None] - cx, query[:, 1, None] - cy
+        det = (by - cy) * (ax - cx) + (cx - bx) * (ay - cy)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            l1 = ((by - cy) * px + (cx - bx) * py) / det
+            l2 = ((cy - ay) * px + (ax - cx) * py) / det
+        l3 = 1.0 - l1 - l2
+        tol = -1e-9
+        hit = (det != 0) & (l1 >= tol) & (l2 >= tol) & (l3 >= tol)
+        z = np.where(hit, l1 * az + l2 * bz + l3 * cz, -np.inf).max(axis=1)
+        return np.where(np.isfinite(z), z, np.nan)
+
+    def nearest_centroid_indices(self, xy):
+        indices = np.full(len(xy), -1, dtype=np.intp)
+        if self._buckets is not None:
+            for start in range(0, len(xy), 65536):
+                indices[start:start + 65536] = self.bucket_nearest_indices(xy[start:start + 65536])
+        missing = np.flatnonzero(indices < 0)
+        if missing.size:
+            indices[missing] = self.search_nearest_indices(xy[missing])
+        return indices
+
+    def search_nearest_indices(self, xy):
+        if self._kdtree is not None:
+            _, indices = self._kdtree.query(xy, workers=-1)
+            return indices
+        # Brute force in blocks so the distance matrix stays around 4M entries.
+        indices = np.empty(len(xy), dtype=np.intp)
+        block = max(1, 4_000_000 // max(1, len(self._centroids_xy)))
+        for start in range(0, len(xy), block):
+            distances = np.sum((self._centroids_xy[None, :, :] - xy[start:start + block, None, :])**2, axis=2)
+            indices[start:start + block] = np.argmin(distances, axis=1)
+        return indices
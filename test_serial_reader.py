@@ -0,0 +1,59 @@
+# SerialReader lives in the Qt application module, so these tests only run where its GUI
+# dependencies are installed.
+import pytest
+
+pytest.importorskip("PyQt5")
+pytest.importorskip("serial")
+pytest.importorskip("stl")
+pytest.importorskip("pyvista")
+pytest.importorskip("pyvistaqt")
+
+from PyQt5 import QtCore  # noqa: E402
+
+from combine1 import SerialReader  # noqa: E402
+
+
+class FakeSerial:
+    # Hands out the given byte chunks one read at a time, then reports the port as closed.
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.is_open = True
+
+    @property
+    def in_waiting(self):
+        return len(self.chunks[0]) if self.chunks else 0
+
+    def read(self, size):
+        if not self.chunks:
+            self.is_open = False
+            return b""
+        return self.chunks.pop(0)
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+def run_reader(tmp_path, chunks, zero_point=8150):
+    data_file = tmp_path / "data.txt"
+    reader = SerialReader(FakeSerial(chunks), str(data_file), zero_point)
+    output = []
+    reader.output.connect(output.append, QtCore.Qt.DirectConnection)
+    reader.run()  # in this thread; returns once the fake port closes and the writer has drained
+    return data_file.read_text(), "\n".join(output).splitlines()
+
+
+def test_samples_split_across_reads(app, tmp_path):
+    data, monitor = run_reader(tmp_path, [b"8150\r\n81", b"60\r\n8", b"140\r\n"])
+    assert data == "--- Section 1 ---\n0.00\n0.10\n-0.10\n"
+    assert monitor == ["Sensor: 8150, Height: 0.00 mm",
+                       "Sensor: 8160, Height: 0.10 mm",
+                       "Sensor: 8140, Height: -0.10 mm"]
+
+
+def test_only_plain_digit_samples_are_kept(app, tmp_path):
+    # Same filter as the original readline loop: stripped lines made of digits only.
+    data, monitor = run_reader(tmp_path, [b"abc\n-5\n+5\n1_0\n\n 8250 \n12a\n"])
+    assert data == "--- Section 1 ---\n1.00\n"
+    assert monitor == ["Sensor: 8250, Height: 1.00 mm"]
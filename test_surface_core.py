@@ -0,0 +1,524 @@
+# Pins the surface_core helpers to the per-line / per-point code they replaced in combine1.py.
+# The reference functions below are that original code, trimmed to what the comparisons need.
+import os
+import re
+
+import numpy as np
+import pytest
+
+import surface_core
+from surface_core import (
+    parse_coordinates,
+    generate_gcode_line,
+    parse_xy_moves,
+    shift_gcode_xy,
+    gcode_xy_bounds,
+    center_offset,
+    compute_gcode_stats,
+    interpolate_segments,
+    interpolate_arcs,
+    parse_gcode,
+    parse_height_map_file,
+    build_height_map_mesh,
+    StlHeightLookup,
+    CENTER_ANCHORS
+)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_GCODE = os.path.join(HERE, "T3.cnc")
+SAMPLE_OUTPUT_GCODE = os.path.join(HERE, "T3_output.cnc")
+SAMPLE_STL = os.path.join(HERE, "1.stl")
+
+
+def read_lines(path):
+    with open(path, "r") as file:
+        return file.readlines()
+
+
+# ----------------------- Original implementations -----------------------
+def reference_parse_coordinates(line):
+    coords = {}
+    for part in line.strip().split():
+        if part[:1] in ("X", "Y", "Z", "F", "I", "J", "S"):
+            try:
+                coords[part[0]] = float(part[1:])
+            except ValueError:
+                coords[part[0]] = None
+    return coords
+
+
+def reference_generate_gcode_line(coords, command="G1"):
+    line = f"{command}"
+    if coords.get("X") is not None:
+        line += f" X{coords['X']:.4f}"
+    if coords.get("Y") is not None:
+        line += f" Y{coords['Y']:.4f}"
+    if coords.get("Z") is not None:
+        line += f" Z{coords['Z']:.4f}"
+    if coords.get("F") is not None:
+        line += f" F{coords['F']:.1f}"
+    if coords.get("S") is not None:
+        line += f" S{int(coords['S'])}"
+    line += "\n"
+    return line
+
+
+def reference_shift_gcode_xy(lines, off_x, off_y):
+    new_lines = []
+    pattern = re.compile(r"^(G0|G1)")
+    for line in lines:
+        if pattern.match(line):
+            coords = reference_parse_coordinates(line)
+            if coords.get("X") is not None:
+                coords["X"] += off_x
+            if coords.get("Y") is not None:
+                coords["Y"] += off_y
+            new_lines.append(reference_generate_gcode_line(coords, command=line.split()[0]))
+        else:
+            new_lines.append(line)
+    return new_lines
+
+
+def reference_center_offset(lines, center_choice):
+    xs, ys = [], []
+    pattern = re.compile(r"^(G0|G1)")
+    for line in lines:
+        if pattern.match(line):
+            coords = reference_parse_coordinates(line)
+            if coords.get("X") is not None:
+                xs.append(coords["X"])
+            if coords.get("Y") is not None:
+                ys.append(coords["Y"])
+    min_x, max_x = min(xs), max(xs)
+    min_y, max_y = min(ys), max(ys)
+    current_center = ((min_x + max_x) / 2, (min_y + max_y) / 2)
+    desired_center = {
+        "Top-Left": (min_x, max_y), "Top-Center": ((min_x + max_x) / 2, max_y), "Top-Right": (max_x, max_y),
+        "Middle-Left": (min_x, (min_y + max_y) / 2), "Center": current_center,
+        "Middle-Right": (max_x, (min_y + max_y) / 2),
+        "Bottom-Left": (min_x, min_y), "Bottom-Center": ((min_x + max_x) / 2, min_y), "Bottom-Right": (max_x, min_y),
+    }.get(center_choice, current_center)
+    return desired_center[0] - current_center[0], desired_center[1] - current_center[1]
+
+
+def reference_interpolate_segment(start, end, steps=10):
+    points = []
+    for i in range(0, steps + 1):
+        factor = i / float(steps)
+        points.append([start["X"] + (end["X"] - start["X"]) * factor,
+                       start["Y"] + (end["Y"] - start["Y"]) * factor,
+                       start["Z"] + (end["Z"] - start["Z"]) * factor])
+    return points
+
+
+def reference_interpolate_arc(start, end, I, J, steps=10):
+    points = []
+    center_x = start["X"] + (I if I is not None else 0)
+    center_y = start["Y"] + (J if J is not None else 0)
+    radius = np.sqrt((I if I is not None else 0)**2 + (J if J is not None else 0)**2)
+    start_angle = np.arctan2(start["Y"] - center_y, start["X"] - center_x)
+    end_angle = np.arctan2(end["Y"] - center_y, end["X"] - center_x)
+    if end_angle > start_angle:
+        end_angle -= 2 * np.pi
+    delta_angle = end_angle - start_angle
+    for i in range(0, steps + 1):
+        factor = i / float(steps)
+        theta = start_angle + delta_angle * factor
+        points.append([center_x + radius * np.cos(theta), center_y + radius * np.sin(theta),
+                       start["Z"] + (end["Z"] - start["Z"]) * factor])
+    return points
+
+
+def reference_compute_gcode_stats(lines):
+    xs, ys, zs = [], [], []
+    pattern = re.compile(r"[Gg][0|1|2].*")
+    for line in lines:
+        if pattern.match(line):
+            coords = reference_parse_coordinates(line)
+            if coords.get("X") is not None:
+                xs.append(coords["X"])
+            if coords.get("Y") is not None:
+                ys.append(coords["Y"])
+            if coords.get("Z") is not None:
+                zs.append(coords["Z"])
+    if xs and ys and zs:
+        dim_str = f"X: [{min(xs):.4f}, {max(xs):.4f}]  Y: [{min(ys):.4f}, {max(ys):.4f}]  Z: [{min(zs):.4f}, {max(zs):.4f}]"
+    else:
+        dim_str = "Bilinmiyor"
+    return dim_str, len(lines)
+
+
+def reference_parse_gcode(file_path):
+    coordinates = []
+    current_position = [0.0, 0.0, 0.2]
+    with open(file_path, 'r') as file:
+        for line in file.readlines():
+            line = line.strip()
+            if line.startswith('G1') or line.startswith('G0'):
+                x, y, z = current_position
+                if 'X' in line:
+                    x = float(re.search(r'X([-+]?\d*\.?\d+)', line).group(1))
+                if 'Y' in line:
+                    y = float(re.search(r'Y([-+]?\d*\.?\d+)', line).group(1))
+                if 'Z' in line:
+                    z = float(re.search(r'Z([-+]?\d*\.?\d+)', line).group(1))
+                coordinates.append([x, y, z])
+                current_position = [x, y, z]
+            elif line.startswith('G2') or line.startswith('G3'):
+                gcode_parts = re.findall(r'[XYZIJ][-+]?\d*\.?\d+', line)
+                gcode_parts = {item[0]: float(item[1:]) for item in gcode_parts}
+                x, y, z = current_position
+                i = gcode_parts.get('I', None)
+                j = gcode_parts.get('J', None)
+                end_x = gcode_parts.get('X', x)
+                end_y = gcode_parts.get('Y', y)
+                if i is not None and j is not None:
+                    center_x = x + i
+                    center_y = y + j
+                    radius = np.sqrt(i**2 + j**2)
+                    start_angle = np.arctan2(y - center_y, x - center_x)
+                    end_angle = np.arctan2(end_y - center_y, end_x - center_x)
+                    if line.startswith('G2'):
+                        if end_angle < start_angle:
+                            end_angle += 2 * np.pi
+                    else:
+                        if end_angle > start_angle:
+                            end_angle -= 2 * np.pi
+                    for angle in np.linspace(start_angle, end_angle, 20):
+                        coordinates.append([center_x + radius * np.cos(angle), center_y + radius * np.sin(angle), z])
+                    current_position = [coordinates[-1][0], coordinates[-1][1], z]
+                else:
+                    coordinates.append([end_x, end_y, z])
+                    current_position = [end_x, end_y, z]
+    return np.array(coordinates)
+
+
+def reference_parse_height_map_file(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    sections = []
+    current_section = None
+    for line in lines:
+        line = line.strip()
+        if line.startswith("--- Bölüm"):
+            if current_section is not None:
+                sections.append(current_section)
+            current_section = []
+        elif current_section is not None and line:
+            try:
+                current_section.append(float(line))
+            except ValueError:
+                continue
+    if current_section is not None:
+        sections.append(current_section)
+    max_length = max(len(section) for section in sections)
+    height_map = np.full((len(sections), max_length), np.nan)
+    for i, section in enumerate(sections):
+        height_map[i, :len(section)] = section
+    return height_map
+
+
+def reference_smooth_height_map(height_map, threshold=0.5, max_iterations=10):
+    y_count, x_count = height_map.shape
+    for _ in range(max_iterations):
+        adjusted = False
+        for j in range(y_count):
+            for i in range(x_count):
+                if i < x_count - 1:
+                    diff = height_map[j, i+1] - height_map[j, i]
+                    if abs(diff) > threshold:
+                        mean_val = (height_map[j, i+1] + height_map[j, i]) / 2.0
+                        height_map[j, i] = mean_val
+                        height_map[j, i+1] = mean_val
+                        adjusted = True
+                if j < y_count - 1:
+                    diff = height_map[j+1, i] - height_map[j, i]
+                    if abs(diff) > threshold:
+                        mean_val = (height_map[j+1, i] + height_map[j, i]) / 2.0
+                        height_map[j, i] = mean_val
+                        height_map[j+1, i] = mean_val
+                        adjusted = True
+        if not adjusted:
+            break
+    return height_map
+
+
+def reference_mesh_triangles(height_map, x_step, y_step):
+    # Corner coordinates of every triangle the original loops emitted, before centring. The
+    # original indexed its faces into the full grid, which only matched its NaN-free vertex list
+    # when the map had no NaN cells; building the corners from the grid itself avoids that.
+    y_count, x_count = height_map.shape
+    triangles = []
+    for j in range(y_count - 1):
+        for i in range(x_count - 1):
+            if not np.isnan(height_map[j:j + 2, i:i + 2]).any():
+                corner = lambda jj, ii: (ii * x_step, jj * y_step, height_map[jj, ii])
+                triangles.append([corner(j, i), corner(j, i + 1), corner(j + 1, i)])
+                triangles.append([corner(j + 1, i), corner(j, i + 1), corner(j + 1, i + 1)])
+    return np.array(triangles, dtype=np.float64).reshape(-1, 3, 3)
+
+
+def reference_nearest_centroid_z(vectors, x, y):
+    centroids = np.mean(vectors, axis=1)
+    distances = np.sqrt((centroids[:, 0] - x)**2 + (centroids[:, 1] - y)**2)
+    return centroids[np.argmin(distances), 2]
+
+
+def reference_surface_height(vectors, x, y):
+    # Highest barycentric height among all triangles containing (x, y), or None.
+    best = None
+    for a, b, c in vectors.astype(np.float64):
+        det = (b[1] - c[1]) * (a[0] - c[0]) + (c[0] - b[0]) * (a[1] - c[1])
+        if det == 0:
+            continue
+        l1 = ((b[1] - c[1]) * (x - c[0]) + (c[0] - b[0]) * (y - c[1])) / det
+        l2 = ((c[1] - a[1]) * (x - c[0]) + (a[0] - c[0]) * (y - c[1])) / det
+        l3 = 1.0 - l1 - l2
+        if min(l1, l2, l3) >= -1e-9:
+            z = l1 * a[2] + l2 * b[2] + l3 * c[2]
+            best = z if best is None else max(best, z)
+    return best
+
+
+class StlMesh:
+    # Stand-in for stl.mesh.Mesh: StlHeightLookup only reads .vectors.
+    def __init__(self, vectors):
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+
+
+def read_binary_stl(path):
+    record = np.dtype([("normal", "<f4", (3,)), ("vectors", "<f4", (3, 3)), ("attr", "<u2")])
+    with open(path, "rb") as file:
+        file.seek(80)
+        count = int(np.frombuffer(file.read(4), dtype="<u4")[0])
+        return StlMesh(np.frombuffer(file.read(count * record.itemsize), dtype=record)["vectors"])
+
+
+def grid_mesh(z_function, size=10.0, cells=20):
+    g = np.linspace(0.0, size, cells + 1)
+    xx, yy = np.meshgrid(g, g)
+    zz = z_function(xx, yy)
+    triangles = []
+    for j in range(cells):
+        for i in range(cells):
+            p = lambda jj, ii: (xx[jj, ii], yy[jj, ii], zz[jj, ii])
+            triangles.append([p(j, i), p(j, i + 1), p(j + 1, i)])
+            triangles.append([p(j + 1, i + 1), p(j + 1, i), p(j, i + 1)])
+    return StlMesh(triangles)
+
+
+# ----------------------- G-code words -----------------------
+EDGE_LINES = [
+    "G1 X10. Y5.5 F100.\n",
+    "G1 X1e-3 Y2\n",
+    "G0 X-.5 Y+3 Z1 S1000\n",
+    "G0 X10. Y5 Z1\n",
+    "G1 X1.2.3 Yabc Z2\n",
+    "G2 X1 Y1 I0.5 J-0.5 F200\n",
+]
+
+
+@pytest.mark.parametrize("path", [SAMPLE_GCODE, SAMPLE_OUTPUT_GCODE])
+def test_parse_coordinates_matches_original_on_samples(path):
+    for line in read_lines(path):
+        assert parse_coordinates(line) == reference_parse_coordinates(line), line
+
+
+@pytest.mark.parametrize("line", EDGE_LINES)
+def test_parse_coordinates_edge_words(line):
+    # Malformed words are left out instead of being stored as None; everything else matches.
+    expected = {axis: value for axis, value in reference_parse_coordinates(line).items() if value is not None}
+    assert parse_coordinates(line) == expected
+
+
+def test_generate_gcode_line_matches_original():
+    for line in read_lines(SAMPLE_GCODE) + EDGE_LINES:
+        coords = parse_coordinates(line)
+        assert generate_gcode_line(coords, "G1") == reference_generate_gcode_line(coords, "G1")
+
+
+@pytest.mark.parametrize("path", [SAMPLE_GCODE, SAMPLE_OUTPUT_GCODE])
+def test_shift_gcode_xy_matches_original(path):
+    lines = read_lines(path)
+    assert shift_gcode_xy(lines, 1.25, -3.5) == reference_shift_gcode_xy(lines, 1.25, -3.5)
+    parsed = parse_xy_moves(lines)
+    assert shift_gcode_xy(lines, 0.0, 0.0, parsed) == reference_shift_gcode_xy(lines, 0.0, 0.0)
+
+
+@pytest.mark.parametrize("center_choice", list(CENTER_ANCHORS) + ["Unknown"])
+def test_center_offset_matches_original(center_choice):
+    lines = read_lines(SAMPLE_OUTPUT_GCODE)
+    bounds = gcode_xy_bounds(lines)
+    assert center_offset(bounds, center_choice) == pytest.approx(reference_center_offset(lines, center_choice))
+
+
+def test_gcode_xy_bounds_without_coordinates():
+    assert gcode_xy_bounds(["M3\n", "G4 P100\n"]) is None
+
+
+@pytest.mark.parametrize("path", [SAMPLE_GCODE, SAMPLE_OUTPUT_GCODE])
+def test_compute_gcode_stats_matches_original(path):
+    lines = read_lines(path)
+    assert compute_gcode_stats(lines) == reference_compute_gcode_stats(lines)
+
+
+def test_parse_gcode_matches_original():
+    expected = reference_parse_gcode(SAMPLE_GCODE)
+    coordinates = parse_gcode(SAMPLE_GCODE)
+    assert coordinates.shape == expected.shape
+    np.testing.assert_allclose(coordinates, expected, rtol=0, atol=1e-9)
+
+
+def random_moves(seed, count=25):
+    rng = np.random.default_rng(seed)
+    point = lambda: dict(zip("XYZ", rng.uniform(-50.0, 50.0, 3)))
+    segments = [(point(), point()) for _ in range(count)]
+    arcs = [(start, end, rng.uniform(-10.0, 10.0), rng.uniform(-10.0, 10.0)) for start, end in segments]
+    arcs[0] = (arcs[0][0], arcs[0][1], None, 3.0)  # a missing I or J counts as 0
+    return segments, arcs
+
+
+def move_arrays(segments, arcs):
+    starts = np.array([[start[a] for a in "XYZ"] for start, _ in segments])
+    ends = np.array([[end[a] for a in "XYZ"] for _, end in segments])
+    offsets = np.array([(I if I is not None else 0, J if J is not None else 0) for _, _, I, J in arcs], dtype=np.float64)
+    return starts, ends, offsets
+
+
+# The _kernel variants are the Numba-compiled (prange) ones when Numba is installed and plain
+# Python loops otherwise; the _vectorized variants are the NumPy fallback.
+@pytest.mark.parametrize("steps", [1, 7, 20])
+@pytest.mark.parametrize("variant", ["_kernel", "_vectorized"])
+def test_interpolation_kernels_match_original(variant, steps):
+    segments, arcs = random_moves(steps)
+    starts, ends, offsets = move_arrays(segments, arcs)
+    segment_points = getattr(surface_core, "_interpolate_segments" + variant)(starts, ends, steps)
+    arc_points = getattr(surface_core, "_interpolate_arcs" + variant)(starts, ends, offsets, steps)
+    expected_segments = [reference_interpolate_segment(start, end, steps) for start, end in segments]
+    expected_arcs = [reference_interpolate_arc(start, end, I, J, steps) for start, end, I, J in arcs]
+    np.testing.assert_allclose(segment_points, expected_segments, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(arc_points, expected_arcs, rtol=0, atol=1e-9)
+
+
+def test_interpolation_through_jitted_kernels():
+    pytest.importorskip("numba")
+    assert surface_core.NUMBA_AVAILABLE
+    segments, arcs = random_moves(11)
+    np.testing.assert_allclose(interpolate_segments(segments, steps=10),
+                               [reference_interpolate_segment(start, end, 10) for start, end in segments],
+                               rtol=0, atol=1e-9)
+    np.testing.assert_allclose(interpolate_arcs(arcs, steps=10),
+                               [reference_interpolate_arc(start, end, I, J, 10) for start, end, I, J in arcs],
+                               rtol=0, atol=1e-9)
+
+
+def test_interpolation_rejects_zero_steps():
+    # Zero steps divided by zero and wrote NaN coordinates into the G-code.
+    segments, arcs = random_moves(12, count=2)
+    with pytest.raises(ValueError):
+        interpolate_segments(segments, steps=0)
+    with pytest.raises(ValueError):
+        interpolate_arcs(arcs, steps=0)
+
+
+# ----------------------- Height maps -----------------------
+HEIGHT_MAP_TEXT = """probe log, ignored before the first section
+1.0
+--- Bölüm 1 ---
+0.10
+0.25
+not a number
+0.40
+
+--- Bölüm 2 ---
+0.12
+0.30
+--- Bölüm 3 ---
+-0.05
+0.20
+0.35
+0.50
+"""
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "cp1254"])
+def test_parse_height_map_file_matches_original(tmp_path, encoding):
+    utf8_path = tmp_path / "utf8.txt"
+    utf8_path.write_text(HEIGHT_MAP_TEXT, encoding="utf-8")
+    path = tmp_path / "heights.txt"
+    path.write_text(HEIGHT_MAP_TEXT, encoding=encoding)
+    expected = reference_parse_height_map_file(utf8_path)
+    height_map = parse_height_map_file(path)
+    assert height_map.dtype == np.float32
+    np.testing.assert_array_equal(height_map, expected.astype(np.float32))
+
+
+def random_height_map(seed, shape=(9, 12), nan_fraction=0.15):
+    rng = np.random.default_rng(seed)
+    height_map = rng.normal(0.0, 1.0, shape).astype(np.float32)
+    height_map[rng.random(shape) < nan_fraction] = np.nan
+    return height_map
+
+
+@pytest.mark.parametrize("mesh_builder", ["_height_map_mesh_kernel", "_height_map_mesh_vectorized"])
+@pytest.mark.parametrize("nan_fraction", [0.0, 0.15])
+def test_height_map_mesh_triangles_match_original(mesh_builder, nan_fraction):
+    height_map = random_height_map(3, nan_fraction=nan_fraction)
+    vertices, faces = getattr(surface_core, mesh_builder)(height_map, 0.5, 0.75)
+    expected = reference_mesh_triangles(height_map, 0.5, 0.75)
+    np.testing.assert_allclose(vertices[faces], expected, rtol=0, atol=1e-6)
+
+
+def test_build_height_map_mesh_is_centred():
+    vertices, faces = build_height_map_mesh(random_height_map(4), 0.5, 0.5)
+    np.testing.assert_allclose(vertices.mean(axis=0), 0.0, atol=1e-5)
+    assert faces.max() < len(vertices)
+
+
+def test_smooth_height_map_kernel_matches_original():
+    height_map = random_height_map(5, nan_fraction=0.0)
+    expected = reference_smooth_height_map(height_map.copy())
+    smoothed = surface_core._smooth_height_map_kernel(height_map.copy(), 0.5, 10)
+    np.testing.assert_array_equal(smoothed, expected)
+
+
+# ----------------------- STL surface heights -----------------------
+def assert_heights_match_reference(stl_mesh, queries):
+    heights = StlHeightLookup(stl_mesh).heights(queries)
+    for (x, y), z in zip(queries, heights):
+        expected = reference_surface_height(stl_mesh.vectors, x, y)
+        if expected is None:
+            # Off the surface: the original per-point nearest-centroid lookup.
+            expected = reference_nearest_centroid_z(stl_mesh.vectors, x, y)
+        assert z == pytest.approx(expected, abs=1e-5), (x, y)
+
+
+def test_stl_heights_on_grid_mesh():
+    stl_mesh = grid_mesh(lambda x, y: np.sin(x) + 0.1 * y)
+    queries = np.random.default_rng(6).uniform(-2.0, 12.0, (300, 2))
+    assert_heights_match_reference(stl_mesh, queries)
+
+
+def test_stl_heights_with_large_triangle():
+    # One triangle far larger than the rest widens the bucket cells instead of skipping them.
+    stl_mesh = grid_mesh(lambda x, y: 0.2 * x - 0.1 * y)
+    stl_mesh.vectors = np.concatenate([stl_mesh.vectors, [[(10, 0, 5), (16, 0, 5), (10, 6, 6)]]]).astype(np.float32)
+    queries = np.random.default_rng(7).uniform(-1.0, 17.0, (300, 2))
+    assert_heights_match_reference(stl_mesh, queries)
+
+
+def test_stl_heights_on_clustered_mesh():
+    # Too clustered for the bucket grid: every triangle is tested instead.
+    stl_mesh = grid_mesh(lambda x, y: np.cos(y))
+    stl_mesh.vectors = np.concatenate([stl_mesh.vectors, stl_mesh.vectors * 0.001])
+    lookup = StlHeightLookup(stl_mesh)
+    assert lookup._buckets is None
+    queries = np.random.default_rng(8).uniform(-1.0, 11.0, (100, 2))
+    assert_heights_match_reference(stl_mesh, queries)
+
+
+def test_stl_heights_on_sample_stl():
+    stl_mesh = read_binary_stl(SAMPLE_STL)
+    (min_x, min_y, _), (max_x, max_y, _) = StlHeightLookup(stl_mesh).bounds
+    queries = np.random.default_rng(9).uniform((min_x - 1, min_y - 1), (max_x + 1, max_y + 1), (200, 2))
+    assert_heights_match_reference(stl_mesh, queries)